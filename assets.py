@@ -0,0 +1,101 @@
+import os
+
+import pygame
+
+ATLAS_WIDTH = 256  # Width of the atlas surfaces, sprites are packed in rows
+
+# Whether an image uses per-pixel alpha for anything but fully opaque pixels
+def has_transparency(image):
+    return bool(image.get_flags() & pygame.SRCALPHA) and pygame.surfarray.array_alpha(image).min() < 255
+
+# Place rectangles of the given sizes left to right in rows of a fixed width.
+# Sizes sorted by height, tallest first, waste the least space.
+def pack_rows(sizes, width):
+    rects = []
+    x = y = row_height = 0
+    for w, h in sizes:
+        if w > width:
+            raise ValueError(f'a sprite of width {w} does not fit in an atlas of width {width}')
+        if x + w > width:
+            x = 0
+            y += row_height
+            row_height = 0
+        rects.append(pygame.Rect(x, y, w, h))
+        x += w
+        row_height = max(row_height, h)
+    return rects
+
+# Loads sprites once, converted to the display format, and serves them as named
+# subsurfaces of an atlas. Nothing is read before the first get(). Opaque and
+# transparent sprites go to separate atlases, so opaque ones are blitted without
+# per-pixel alpha. Scaled versions are cached by (name, scale); names outside the atlas
+# are loaded on their own when asked for. Without a display, as in headless sessions,
+# sprites are loaded as they are and never packed.
+class AssetManager:
+    def __init__(self, names, directory='.', atlas_width=ATLAS_WIDTH):
+        self.names = list(names)
+        self.directory = directory
+        self.atlas_width = atlas_width
+        self.atlases = {}
+        self.regions = {}
+        self.cache = {}
+        self.loads = 0
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.png')
+
+    # Load one image in the display format, keeping per-pixel alpha only if it is used
+    def load(self, name):
+        image = pygame.image.load(self.path(name))
+        self.loads += 1
+        if pygame.display.get_surface() is None:
+            return image
+        if has_transparency(image):
+            return image.convert_alpha()
+        return image.convert()
+
+    def build_atlas(self):
+        images = {name: self.load(name) for name in self.names}
+        for alpha in (False, True):
+            names = [name for name, image in images.items() if bool(image.get_flags() & pygame.SRCALPHA) == alpha]
+            if not names:
+                continue
+            names.sort(key=lambda name: -images[name].get_height())
+            rects = pack_rows([images[name].get_size() for name in names], self.atlas_width)
+            size = (self.atlas_width, max(rect.bottom for rect in rects))
+            if alpha:
+                atlas = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+                atlas.fill((0, 0, 0, 0))
+            else:
+                atlas = pygame.Surface(size).convert()
+            for name, rect in zip(names, rects):
+                # Copy the pixels as they are instead of blending them onto the empty atlas
+                atlas.blit(images[name], rect, special_flags=pygame.BLEND_RGBA_MAX if alpha else 0)
+                self.regions[name] = atlas.subsurface(rect)
+            self.atlases[alpha] = atlas
+
+    def get(self, name, scale=1):
+        key = (name, scale)
+        image = self.cache.get(key)
+        if image is None:
+            if scale != 1:
+                base = self.get(name)
+                size = (round(base.get_width() * scale), round(base.get_height() * scale))
+                image = pygame.transform.scale(base, size)
+            elif name in self.names and pygame.display.get_surface() is not None:
+                if not self.regions:
+                    self.build_atlas()
+                image = self.regions[name]
+            else:
+                image = self.load(name)
+            self.cache[key] = image
+        return image
+
+
+# Sprites for a session that draws nothing, e.g. on a server or in a runner worker. pygame
+# still needs a video driver to load images, so the SDL dummy drivers are used unless
+# another one is set. There is no display, so the sprites are loaded as they are and never packed.
+def headless_assets():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    return AssetManager(())
@@ -0,0 +1,42 @@
+# Blit throughput of sprites as loaded from PNG versus converted sprites in the texture atlas
+import random
+
+from common import setup_headless, report, time_per_call
+
+setup_headless()
+
+import pygame
+import byggespillet as game
+from assets import AssetManager
+
+session = game.setup()
+
+BLITS = 5000
+REPEATS = 20
+
+def blit_all(images, positions):
+    game.screen.blits(list(zip(images, positions)), False)
+
+def main():
+    rng = random.Random(0)
+    names = [rng.choice(game.SPRITES) for _ in range(BLITS)]
+    positions = [(rng.randrange(game.SCREEN_WIDTH - 32), rng.randrange(game.SCREEN_HEIGHT - 32)) for _ in names]
+    manager = AssetManager(game.SPRITES)
+    sprite_sets = {
+        'unconverted': {name: pygame.image.load(f'{name}.png') for name in game.SPRITES},
+        'atlas': {name: manager.get(name) for name in game.SPRITES},
+    }
+
+    times = {}
+    for label, sprites in sprite_sets.items():
+        times[label] = time_per_call(lambda: blit_all([sprites[name] for name in names], positions), REPEATS)
+        report(f'{BLITS} blits, {label}', times[label], 'ms')
+    print(f"speedup: {times['unconverted'] / times['atlas']:.1f}x")
+
+    # The map background is drawn tile by tile from the grass and stone sprites
+    for label, sprites in sprite_sets.items():
+        tiles = session.map.get_current_map()
+        report(f'render background, {label}', time_per_call(lambda: game.render_background(tiles, sprites), REPEATS), 'ms')
+
+if __name__ == '__main__':
+    main()
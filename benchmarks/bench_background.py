@@ -0,0 +1,30 @@
+# Frame time of drawing the map tile by tile versus blitting the cached background
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import pygame
+import byggespillet as game
+
+session = game.setup()
+
+FRAMES = 300
+
+def tile_frame():
+    game.screen.fill((0, 0, 0))
+    game.draw_tiles(game.screen, session.map.get_current_map())
+    pygame.display.flip()
+
+def cached_frame():
+    game.screen.blit(game.background_cache.get(session.map), (0, 0))
+    pygame.display.flip()
+
+def main():
+    tile_ms = time_per_call(tile_frame, FRAMES)
+    cached_ms = time_per_call(cached_frame, FRAMES)
+    report('per-tile blits', tile_ms)
+    report('cached background', cached_ms)
+    print(f'speedup: {tile_ms / cached_ms:.1f}x')
+
+if __name__ == '__main__':
+    main()
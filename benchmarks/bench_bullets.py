@@ -0,0 +1,79 @@
+# Rapid fire: one sprite per bullet versus the fixed-capacity bullet pool
+import gc
+
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import pygame
+import byggespillet as game
+from entities import BulletPool
+from session import BULLET_SPEED
+
+game.setup()
+bullet_image = game.assets.get('bullet')
+
+FRAMES = 2000
+SHOTS_PER_FRAME = 8
+LIFETIME = 30  # Frames before a bullet expires
+
+# The sprite-per-bullet approach the game used before the pool
+class SpriteBullet(pygame.sprite.Sprite):
+    def __init__(self, x, y, direction):
+        super().__init__()
+        self.image = bullet_image
+        self.rect = self.image.get_rect(topleft=(x, y))
+        self.direction = direction
+        self.age = 0
+
+    def update(self):
+        if self.direction == 'left':
+            self.rect.x -= BULLET_SPEED
+        elif self.direction == 'right':
+            self.rect.x += BULLET_SPEED
+        self.age += 1
+        if self.age > LIFETIME:
+            self.kill()
+
+def collections():
+    return sum(stats['collections'] for stats in gc.get_stats())
+
+def run_sprites():
+    group = pygame.sprite.Group()
+
+    def frame():
+        for i in range(SHOTS_PER_FRAME):
+            group.add(SpriteBullet(500, 100 + i * 10, 'right' if i % 2 else 'left'))
+        group.update()
+    return frame, lambda: None
+
+def run_pool():
+    pool = BulletPool(bullet_image, SHOTS_PER_FRAME * (LIFETIME + 2))
+    ages = [0] * pool.capacity
+
+    def frame():
+        for i in range(SHOTS_PER_FRAME):
+            slot = pool.spawn(500, 100 + i * 10, BULLET_SPEED if i % 2 else -BULLET_SPEED, 0)
+            ages[slot] = 0
+        pool.step()
+        slots = pool.bounds()[0].tolist()
+        expired = []
+        for slot in slots:
+            ages[slot] += 1
+            if ages[slot] > LIFETIME:
+                expired.append(slot)
+        pool.free(expired)
+        pool.end_frame()
+    return frame, lambda: pool.last_frame
+
+def main():
+    for name, setup in (('sprite per bullet', run_sprites), ('bullet pool', run_pool)):
+        frame, stats = setup()
+        before = collections()
+        report(name, time_per_call(frame, FRAMES))
+        report(name, collections() - before, 'gc collections')
+        if stats():
+            print('last frame:', stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Per-entity corner lookups versus one batched collision call per frame
+import random
+
+from common import setup_headless, time_per_call, report, wait_for_preparation
+
+setup_headless()
+
+import numpy as np
+import byggespillet as game
+
+session = game.setup()
+wait_for_preparation(session.map)
+from tiles import Tile
+
+COUNTS = (10, 100, 1000)
+FRAMES = 50
+
+# The per-corner check every entity class used to carry its own copy of
+def legacy_collides(x, y, width, height):
+    for corner_x, corner_y in ((x, y), (x + width - 1, y), (x, y + height - 1), (x + width - 1, y + height - 1)):
+        if session.map.get_current_map()[corner_y // game.TILE_SIZE, corner_x // game.TILE_SIZE] == Tile.STONE:
+            return True
+    return False
+
+def main():
+    rng = random.Random(0)
+    limit = game.SCREEN_WIDTH - game.TILE_SIZE
+    for count in COUNTS:
+        xs = np.array([rng.randrange(limit) for _ in range(count)])
+        ys = np.array([rng.randrange(limit) for _ in range(count)])
+        sizes = np.full(count, game.TILE_SIZE)
+        positions = list(zip(xs.tolist(), ys.tolist()))
+
+        def legacy():
+            return [legacy_collides(x, y, 32, 32) for x, y in positions]
+
+        def batched():
+            return session.map.collision.collides_rects(xs, ys, sizes, sizes)
+
+        # One untimed call each first, so first-call costs do not count against the first size
+        legacy()
+        batched()
+        legacy_ms = time_per_call(legacy, FRAMES)
+        batched_ms = time_per_call(batched, FRAMES)
+        report(f'{count} entities, per entity', legacy_ms)
+        report(f'{count} entities, batched', batched_ms)
+
+if __name__ == '__main__':
+    main()
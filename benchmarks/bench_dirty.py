@@ -0,0 +1,45 @@
+# Frame time and pixels pushed per frame with full flips versus dirty rectangles
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import pygame
+import byggespillet as game
+from session import Monster, Player
+
+session = game.setup()
+
+FRAMES = 300
+MONSTERS = 40
+
+def setup_sprites():
+    session.player1 = Player(session, 100, 150, {}, game.assets.get('player'))
+    session.player2 = Player(session, 100, 100, {}, game.assets.get('player2'))
+    session.player_group = pygame.sprite.RenderUpdates(session.player1, session.player2)
+    session.bullets = pygame.sprite.RenderUpdates()
+    session.monsters = pygame.sprite.RenderUpdates()
+    for i in range(MONSTERS):
+        session.monsters.add(Monster(session, 200 + (i % 8) * 80, 200 + (i // 8) * 120))
+    game.last_background = None
+    game.pixel_counter = game.PixelCounter()
+
+def frame():
+    # Move the sprites without collision checks so every frame has movement
+    for i, monster in enumerate(session.monsters):
+        monster.rect.x += 1 if (game.pixel_counter.frames // 50 + i) % 2 else -1
+    game.render_frame()
+
+def run(dirty):
+    game.DIRTY_RENDERING = dirty
+    setup_sprites()
+    ms = time_per_call(frame, FRAMES)
+    name = 'dirty rectangles' if dirty else 'full flip'
+    report(name, ms)
+    report(name, game.pixel_counter.average(), 'pixels/frame')
+
+def main():
+    run(False)
+    run(True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# One editor click the old way (ZOOM_FACTOR² set_at calls, rescaling the overlay and a
+# per-pixel PNG write) versus painting the tile array and scaling the layer in one blit,
+# and the old full overview redraw versus the chunked overview, for GRID x GRID cells
+import os
+import sys
+import tempfile
+
+from common import setup_headless, report, time_per_call
+
+setup_headless()
+
+import numpy as np
+import pygame
+import editor
+from tiles import Tile
+
+editor.setup()
+
+REPEATS = 200
+GRID = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+TILE_SIZE = editor.TILE_SIZE
+ZOOM_FACTOR = editor.ZOOM_FACTOR
+
+# The click handler and save_monster the editor used before tile arrays
+def legacy_click(zoomed, x, y, directory):
+    for i in range(ZOOM_FACTOR):
+        for j in range(ZOOM_FACTOR):
+            zoomed.set_at((x * ZOOM_FACTOR + i, y * ZOOM_FACTOR + j), editor.RED + (255,))
+    image = pygame.transform.scale(zoomed, (TILE_SIZE, TILE_SIZE))
+    transparent_image = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+    transparent_image.fill((0, 0, 0, 0))
+    for i in range(TILE_SIZE):
+        for j in range(TILE_SIZE):
+            color = image.get_at((i, j))[:3]
+            if color == editor.RED or color == editor.YELLOW:
+                transparent_image.set_at((i, j), color + (255,))
+    file_path = os.path.join(directory, '0-0-monster.png')
+    pygame.image.save(transparent_image, file_path)
+    pygame.image.load(file_path)
+
+# The overview loop body before chunking: grid lines and a blit of every cell thumbnail
+def legacy_overview(screen, thumbnails):
+    screen.fill((0, 0, 0))
+    for x in range(0, editor.SCREEN_WIDTH, TILE_SIZE):
+        pygame.draw.line(screen, editor.GRID_COLOR, (x, 0), (x, editor.SCREEN_HEIGHT))
+    for y in range(0, editor.SCREEN_HEIGHT, TILE_SIZE):
+        pygame.draw.line(screen, editor.GRID_COLOR, (0, y), (editor.SCREEN_WIDTH, y))
+    for (x, y), image in thumbnails.items():
+        screen.blit(image, (x * TILE_SIZE, y * TILE_SIZE))
+
+def bench_overview():
+    rng = np.random.default_rng(0)
+    cells = [rng.integers(Tile.GRASS, Tile.STONE + 1, (TILE_SIZE, TILE_SIZE)).astype(np.uint8) for _ in range(16)]
+    maps = {(x, y): cells[(x * 7 + y) % len(cells)] for x in range(GRID) for y in range(GRID)}
+    thumbnails = {key: editor.tiles_surface(tiles, editor.MAP_PALETTE) for key, tiles in maps.items()}
+    screen = editor.screen
+    print(f'{len(maps)} cells')
+    report('full overview redraw', time_per_call(lambda: legacy_overview(screen, thumbnails), 5))
+
+    overview = editor.Overview(maps)
+    for scale in editor.OVERVIEW_SCALES:
+        overview.set_scale(scale)
+        report(f'{scale} px/cell, first frame', time_per_call(lambda: overview.draw(screen), 1))
+        report(f'{scale} px/cell, cached frame', time_per_call(lambda: overview.draw(screen), 20))
+    overview.set_scale(editor.TILE_SIZE)
+    overview.draw(screen)
+    report('edited cell update', time_per_call(lambda: overview.update_cell((3, 3)), REPEATS), 'ms')
+
+def main():
+    zoomed = pygame.Surface((TILE_SIZE * ZOOM_FACTOR, TILE_SIZE * ZOOM_FACTOR), pygame.SRCALPHA)
+    overlay = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    target = pygame.Surface(zoomed.get_size())
+    clicks = iter(range(10 ** 9))
+
+    def click():
+        i = next(clicks)
+        editor.paint_line(overlay, (i % TILE_SIZE, i // TILE_SIZE % TILE_SIZE), (i % TILE_SIZE, i // TILE_SIZE % TILE_SIZE),
+                          1, Tile.MONSTER)
+        target.blit(editor.zoomed_surface(overlay, editor.OVERLAY_PALETTE, True), (0, 0))
+
+    def drag():
+        editor.paint_line(overlay, (0, 0), (TILE_SIZE - 1, TILE_SIZE - 1), 3, Tile.BUNNY)
+        target.blit(editor.zoomed_surface(overlay, editor.OVERLAY_PALETTE, True), (0, 0))
+
+    with tempfile.TemporaryDirectory() as directory:
+        report('per-pixel click and save', time_per_call(lambda: legacy_click(zoomed, 3, 4, directory), REPEATS), 'ms/click')
+        report('tile array click', time_per_call(click, REPEATS), 'ms/click')
+        report('tile array diagonal drag', time_per_call(drag, REPEATS), 'ms/stroke')
+        report('tile array flood fill', time_per_call(lambda: editor.flood_fill(overlay, 0, 0, overlay[0, 0] ^ 1), 20), 'ms/fill')
+        cwd = os.getcwd()
+        os.makedirs(os.path.join(directory, 'maps'))
+        os.chdir(directory)
+        report('batched write of one cell', time_per_call(lambda: editor.save_monster(0, 0, overlay), 20), 'ms/write')
+        os.chdir(cwd)
+    bench_overview()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Stress test of enemy movement: per-sprite updates versus the vectorized EnemyGroup step
+import math
+import random
+
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import pygame
+import byggespillet as game
+from entities import EnemyGroup
+from session import MONSTER_SPEED, Bunny, Monster, Player
+
+session = game.setup()
+
+COUNTS = (1000, 10000, 50000)
+PER_SPRITE_LIMIT = 10000  # The per-sprite path is too slow to be worth timing beyond this
+FRAMES = 20
+
+# The per-sprite step the game used before EnemyGroup: one step towards the closest
+# player, unless stone is in the way
+def per_sprite_move(enemy, player1, player2):
+    # Determine the closest player
+    if player1.alive() and player2.alive():
+        distance_to_player1 = math.sqrt((enemy.rect.x - player1.rect.x) ** 2 + (enemy.rect.y - player1.rect.y) ** 2)
+        distance_to_player2 = math.sqrt((enemy.rect.x - player2.rect.x) ** 2 + (enemy.rect.y - player2.rect.y) ** 2)
+        target_player = player1 if distance_to_player1 < distance_to_player2 else player2
+    elif player1.alive():
+        target_player = player1
+    elif player2.alive():
+        target_player = player2
+    else:
+        return  # No players alive, no need to move
+
+    # Move towards the closest player
+    if target_player.rect.x < enemy.rect.x:
+        new_x = enemy.rect.x - MONSTER_SPEED
+    elif target_player.rect.x > enemy.rect.x:
+        new_x = enemy.rect.x + MONSTER_SPEED
+    else:
+        new_x = enemy.rect.x
+
+    if target_player.rect.y < enemy.rect.y:
+        new_y = enemy.rect.y - MONSTER_SPEED
+    elif target_player.rect.y > enemy.rect.y:
+        new_y = enemy.rect.y + MONSTER_SPEED
+    else:
+        new_y = enemy.rect.y
+
+    # Only move if the new position is not inside stone
+    if not session.map.collision.collides_rect(new_x, new_y, enemy.rect.width, enemy.rect.height):
+        enemy.rect.topleft = (new_x, new_y)
+
+def per_sprite_frame(enemies):
+    for enemy in enemies:
+        per_sprite_move(enemy, session.player1, session.player2)
+
+def main():
+    session.player1 = Player(session, 300, 500, {}, game.assets.get('player'))
+    session.player2 = Player(session, 600, 400, {}, game.assets.get('player2'))
+    session.player_group = pygame.sprite.Group(session.player1, session.player2)
+    targets = [session.player1.rect, session.player2.rect]
+    collision = session.map.collision
+
+    rng = random.Random(0)
+    for count in COUNTS:
+        positions = [(rng.randrange(64, 900), rng.randrange(64, 900)) for _ in range(count)]
+        kinds = [Monster if rng.random() < 0.5 else Bunny for _ in range(count)]
+        enemies = [kind(session, x, y) for kind, (x, y) in zip(kinds, positions)]
+        if count <= PER_SPRITE_LIMIT:
+            report(f'{count} enemies, per sprite', time_per_call(lambda: per_sprite_frame(enemies), FRAMES))
+
+        group = EnemyGroup(*[kind(session, x, y) for kind, (x, y) in zip(kinds, positions)])
+        report(f'{count} enemies, vectorized', time_per_call(lambda: group.step(targets, collision, MONSTER_SPEED), FRAMES))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Flow-field pursuit versus greedy movement: recompute cost, step cost and enemies reaching the player
+import random
+import time
+
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import numpy as np
+import pygame
+import byggespillet as game
+from entities import EnemyGroup
+from flowfield import FlowField
+from session import MONSTER_SPEED, Monster
+
+session = game.setup()
+
+COUNTS = (100, 1000, 5000)
+TICKS = 600
+
+def spawn(count, rng):
+    solid = session.map.collision.solid
+    free_tiles = np.argwhere(~solid)
+    group = EnemyGroup()
+    for _ in range(count):
+        y, x = free_tiles[rng.randrange(len(free_tiles))]
+        group.add(Monster(session, int(x) * game.TILE_SIZE, int(y) * game.TILE_SIZE))
+    return group
+
+def pursue(count, use_flow):
+    rng = random.Random(0)
+    group = spawn(count, rng)
+    target = pygame.Rect(15 * game.TILE_SIZE, 8 * game.TILE_SIZE, game.TILE_SIZE, game.TILE_SIZE)
+    flow = FlowField(game.TILE_SIZE) if use_flow else None
+    if flow is not None:
+        flow.update(session.map.collision.solid, [(target.centerx // game.TILE_SIZE, target.centery // game.TILE_SIZE)])
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        group.step([target], session.map.collision, MONSTER_SPEED, flow)
+    elapsed = time.perf_counter() - start
+    _, x, y, width, height = group.bounds()
+    reached = np.count_nonzero((abs(x - target.x) < width) & (abs(y - target.y) < height))
+    return elapsed * 1000 / TICKS, reached
+
+def main():
+    flow = FlowField(game.TILE_SIZE)
+    solid = session.map.collision.solid
+    tiles = iter(range(10 ** 9))
+
+    def recompute():
+        i = next(tiles)
+        flow.update(solid, [(2 + i % 20, 5)])
+    report('flow field recompute', time_per_call(recompute, 200))
+
+    for count in COUNTS:
+        for use_flow in (False, True):
+            ms, reached = pursue(count, use_flow)
+            name = f'{count} enemies, {"flow field" if use_flow else "greedy"}'
+            report(name, ms, f'ms/tick, {reached} reached the player')
+
+if __name__ == '__main__':
+    main()
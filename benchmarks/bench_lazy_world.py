@@ -0,0 +1,48 @@
+# Startup time of eager versus lazy world loading, and cache statistics for a walk across the world
+import sys
+import tempfile
+import time
+
+from common import setup_headless, report, write_world
+
+setup_headless()
+
+import byggespillet as game
+
+GRID = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+STEPS = 200
+
+def walk(world):
+    # Snake through the world one cell at a time, like a player crossing edges
+    direction = 'right'
+    for _ in range(STEPS):
+        if world.current_x == GRID - 1 and direction == 'right' or world.current_x == 0 and direction == 'left':
+            world.current_y = (world.current_y + 1) % GRID
+            direction = 'left' if direction == 'right' else 'right'
+        else:
+            world.current_x += 1 if direction == 'right' else -1
+        assert world.get_current_map() is not None
+        world.prefetch_neighbours()
+        time.sleep(0.002)  # Give the prefetch thread the time a frame would
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'writing {GRID}x{GRID} map cells...')
+        write_world(directory, GRID, monster_every=5)
+
+        start = time.perf_counter()
+        game.Map(0, 0, directory)
+        report('eager startup', (time.perf_counter() - start) * 1000, 'ms')
+
+        start = time.perf_counter()
+        world = game.Map(0, 0, directory, lazy=True)
+        world.get_current_map()
+        report('lazy startup', (time.perf_counter() - start) * 1000, 'ms')
+
+        start = time.perf_counter()
+        walk(world)
+        report('lazy walk', (time.perf_counter() - start) * 1000 / STEPS, 'ms/cell')
+        print('cache stats:', world.cache_stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Loading a synthetic 100x100 world with the old per-pixel loader versus vectorized decoding
+import os
+import sys
+import tempfile
+import time
+
+from common import setup_headless, report, write_world
+
+setup_headless()
+
+from PIL import Image
+import byggespillet as game
+
+GRID = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+# The list-of-lists loader the game used before tile arrays
+def legacy_load_map(file_path):
+    image = Image.open(file_path)
+    pixels = image.load()
+    width, height = image.size
+    game_map = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            r, g, b = pixels[x, y][:3]
+            row.append('s' if (r, g, b) == (128, 128, 128) else 'g')
+        game_map.append(row)
+    return game_map
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'writing {GRID}x{GRID} map cells...')
+        write_world(directory, GRID)
+
+        start = time.perf_counter()
+        for filename in os.listdir(directory):
+            legacy_load_map(os.path.join(directory, filename))
+        report('per-pixel loader', time.perf_counter() - start, 's')
+
+        start = time.perf_counter()
+        world = game.Map(0, 0, directory)
+        report('vectorized loader', time.perf_counter() - start, 's')
+
+        tile_bytes = sum(tiles.nbytes for tiles in world.maps.values())
+        tile_count = sum(tiles.size for tiles in world.maps.values())
+        report('tile storage', tile_bytes / tile_count, 'bytes/tile')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Server tick time and snapshot bandwidth with 1 to 16 bots connected over localhost
+import asyncio
+import random
+import sys
+
+from common import setup_headless, report
+
+setup_headless()
+
+from assets import AssetManager
+from network import FRAME, INPUT, MOVE_MASK, SHOOT_BIT, SPECTATOR, WELCOME, SnapshotDecoder, SnapshotEncoder, capture
+from server import GameServer
+from session import Session
+from world import Map
+
+CLIENTS = [int(arg) for arg in sys.argv[1:]] or [1, 8, 16]
+TICKS = 300
+
+# A client that decodes every snapshot; the players answer each one with random input
+async def bot(port, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection('localhost', port)
+    player = WELCOME.unpack(await reader.readexactly(WELCOME.size))[0]
+    decoder = SnapshotDecoder()
+    mask = 0
+    tick = 0
+    try:
+        while True:
+            length = FRAME.unpack(await reader.readexactly(FRAME.size))[0]
+            decoder.decode(await reader.readexactly(length))
+            if player != SPECTATOR:
+                tick += 1
+                if tick % 30 == 0:
+                    mask = rng.randrange(MOVE_MASK + 1)
+                writer.write(INPUT.pack(tick, mask | (rng.random() < 0.05) << SHOOT_BIT))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def run(clients):
+    server = GameServer(Session(Map(6, 9), AssetManager(())))
+    listener = await asyncio.start_server(server.handle_client, 'localhost', 0)
+    port = listener.sockets[0].getsockname()[1]
+    bots = [asyncio.create_task(bot(port, seed)) for seed in range(clients)]
+    while len(server.clients) < clients:
+        await asyncio.sleep(0.01)
+    await server.run(TICKS)
+    keyframe = len(SnapshotEncoder().encode(capture(server.session, server.ticks))) + FRAME.size
+    server.close()
+    listener.close()
+    await asyncio.gather(*bots)
+    return server.stats(), keyframe
+
+def main():
+    for clients in CLIENTS:
+        stats, keyframe = asyncio.run(run(clients))
+        report(f'{clients} clients, server tick mean', stats['mean_tick_ms'], 'ms/tick')
+        report(f'{clients} clients, server tick worst', stats['worst_tick_ms'], 'ms/tick')
+        report(f'{clients} clients, sent', stats['bytes_per_tick'], 'bytes/tick')
+        report(f'{clients} clients, delta snapshot', stats['bytes_per_snapshot'], f'bytes (full snapshot {keyframe})')
+        if stats['skipped']:
+            print(f'{stats["skipped"]} snapshots skipped for slow clients')
+
+if __name__ == '__main__':
+    main()
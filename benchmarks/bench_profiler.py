@@ -0,0 +1,37 @@
+# Cost of the profiler scopes when disabled and enabled
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+from collections import defaultdict
+
+import byggespillet as game
+
+CALLS = 200000
+TICKS = 2000
+
+def scopes():
+    with game.profiler.scope('players'):
+        pass
+
+# Ticks of the session alone, from a new game each run. game_over() would wait two seconds
+# whenever the players die, so lost games are restarted directly.
+def ticks():
+    session = game.session
+    session.new_game()
+    keys = defaultdict(bool)
+    for _ in range(TICKS):
+        session.tick(keys, [])
+        if session.over:
+            session.new_game()
+
+def main():
+    game.setup()
+    for enabled in (False, True):
+        game.profiler.enabled = enabled
+        name = 'enabled' if enabled else 'disabled'
+        report(f'empty scope, {name}', time_per_call(scopes, CALLS) * 1e6, 'ns/scope')
+        report(f'simulation tick, {name}', time_per_call(ticks, 1) * 1000 / TICKS, 'us/tick')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+# Draw cost of every map cell through the offscreen render target, with full redraws and
+# with dirty rectangles, and the cost of capturing a frame into the ring
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import byggespillet as game
+from goldens import render_cell
+from render import OffscreenTarget
+
+TICKS = 120
+
+def main():
+    target = OffscreenTarget()
+    session = game.setup(target=target)
+    report('frame capture', time_per_call(target.present, 200))
+    for dirty in (False, True):
+        game.DIRTY_RENDERING = dirty
+        mode = 'dirty' if dirty else 'full'
+        for key in sorted(session.map.maps):
+            first, per_frame = render_cell(key, TICKS)
+            report(f'cell {key[0]},{key[1]} {mode}, first frame', first * 1000)
+            report(f'cell {key[0]},{key[1]} {mode}', per_frame * 1000)
+
+if __name__ == '__main__':
+    main()
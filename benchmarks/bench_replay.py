@@ -0,0 +1,110 @@
+# Recorded input scenarios replayed headless, with timings for update, collision and draw
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from common import setup_headless
+
+setup_headless()
+
+import byggespillet as game
+from replay import InputLog
+from session import PLAYER1_CONTROLS, PLAYER2_CONTROLS, Bunny, Monster
+
+session = game.setup()
+
+CONTROLS = [PLAYER1_CONTROLS, PLAYER2_CONTROLS]
+# Profiler timers making up each reported phase
+PHASES = {
+    'update': ('players', 'bullets', 'monsters'),
+    'collision': ('collision',),
+    'draw': ('tiles', 'sprites', 'flip'),
+}
+
+class GameOver(Exception):
+    pass
+
+def end_scenario():
+    raise GameOver()
+
+# Scripted inputs: each returns the held control names per player and who shoots, for a tick
+def transitions_input(tick):
+    # Walk player 1 back and forth through the gap between map 6-9 and 7-9
+    return [['right' if tick // 20 % 2 == 0 else 'left'], []], []
+
+def swarm_input(tick):
+    moves = ('up', 'right', 'down', 'left')
+    return [[moves[tick // 40 % 4]], [moves[(tick // 40 + 2) % 4]]], []
+
+def shooting_input(tick):
+    moves = ('left', 'up', 'right', 'down')
+    return [[moves[tick // 15 % 4]], [moves[(tick // 15 + 1) % 4]]], [0, 1]
+
+def add_swarm(count):
+    def setup():
+        solid = session.map.collision.solid
+        players = [player.rect.center for player in (session.player1, session.player2)]
+        free_tiles = [(x, y) for y in range(2, solid.shape[0] - 2) for x in range(2, solid.shape[1] - 2)
+                      if not solid[y, x] and all(abs(x * game.TILE_SIZE - px) + abs(y * game.TILE_SIZE - py) > 256
+                                                 for px, py in players)]
+        for i in range(count):
+            x, y = free_tiles[i * 7 % len(free_tiles)]
+            kind = Monster if i % 2 else Bunny
+            session.monsters.add(kind(session, x * game.TILE_SIZE, y * game.TILE_SIZE))
+    return setup
+
+SCENARIOS = [
+    # name, start state, scripted input, extra setup, ticks
+    ('map transitions', (6, 9, 960, 768, 100, 100), transitions_input, None, 600),
+    ('monster swarm', (6, 9, 500, 300, 540, 300), swarm_input, add_swarm(400), 600),
+    ('heavy shooting', (6, 9, 500, 300, 540, 300), shooting_input, add_swarm(60), 600),
+]
+
+def record(start, scripted_input, ticks):
+    log = InputLog(CONTROLS, start)
+    for tick in range(ticks):
+        held, shooters = scripted_input(tick)
+        keys = defaultdict(bool)
+        for controls, names in zip(CONTROLS, held):
+            for name in names:
+                keys[controls[name]] = True
+        log.record(keys, shooters)
+    return log
+
+def replay(log, setup):
+    session.new_game(log.start)
+    if setup:
+        setup()
+    players = (session.player1, session.player2)
+    ticks = 0
+    try:
+        for ticks in range(len(log)):
+            keys, shooters = log.tick(ticks)
+            game.simulate_tick(keys, [players[index] for index in shooters])
+            game.render_frame()
+        ticks = len(log)
+    except GameOver:
+        pass
+    return ticks
+
+def main():
+    game.profiler.enabled = True
+    game.game_over = end_scenario
+    with tempfile.TemporaryDirectory() as directory:
+        for name, start, scripted_input, setup, ticks in SCENARIOS:
+            path = os.path.join(directory, 'scenario.bin')
+            record(start, scripted_input, ticks).save(path)
+            log = InputLog.load(path, CONTROLS)
+
+            game.profiler.reset()
+            start_time = time.perf_counter()
+            played = max(replay(log, setup), 1)
+            total = time.perf_counter() - start_time
+            timings = {phase: sum(game.profiler.totals[name] for name in timers) for phase, timers in PHASES.items()}
+            phases = '  '.join(f'{phase} {seconds * 1000 / played:6.3f}' for phase, seconds in timings.items())
+            print(f'{name:<16} {played:4d} ticks  {os.path.getsize(path):4d} bytes  '
+                  f'{total * 1000 / played:6.3f} ms/tick  ({phases} ms)')
+
+if __name__ == '__main__':
+    main()
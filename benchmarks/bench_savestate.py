@@ -0,0 +1,72 @@
+# Save and load time and size of game states with growing numbers of monsters, and a
+# rollback check: a game loaded from a save must play out exactly like the live game did
+# after saving, across a walk into the next cell and back
+import sys
+from collections import defaultdict
+
+from common import setup_headless, report, time_per_call
+
+setup_headless()
+
+from assets import AssetManager
+import savestate
+from replay import InputLog
+from runner import CONTROLS
+from session import Bunny, Monster, Session
+from world import Map
+
+COUNTS = [int(arg) for arg in sys.argv[1:]] or [0, 100, 1000]
+REPEATS = 200
+ROLLBACK_START = (6, 9, 900, 64, 900, 96)  # Next to the opening into cell 7,9
+ROLLBACK_MOVES = (('right', 120), ('left', 180), (None, 300))  # Into 7,9, back to 6,9, then stand
+SAVE_TICK = 160  # In cell 7,9
+
+# Both players walking together, the directions held for the given numbers of ticks
+def walk_log(start, moves):
+    log = InputLog(CONTROLS, start)
+    for name, ticks in moves:
+        keys = defaultdict(bool)
+        if name is not None:
+            for controls in CONTROLS:
+                keys[controls[name]] = True
+        for _ in range(ticks):
+            log.record(keys, [])
+    return log
+
+def play(session, log, start, end):
+    for tick in range(start, end):
+        keys, shooters = log.tick(tick)
+        players = (session.player1, session.player2)
+        session.tick(keys, [players[index] for index in shooters])
+        if session.over:
+            session.new_game()
+
+def new_session(start, count):
+    session = Session(Map(6, 9, keep_state=True), AssetManager(()), start)
+    session.monsters.add(*[(Monster if i % 2 else Bunny)(session, 64 + i * 7 % 400, 600 + i * 13 % 300)
+                           for i in range(count)])
+    return session
+
+def main():
+    log = walk_log(ROLLBACK_START, ROLLBACK_MOVES)
+    for count in COUNTS:
+        session = new_session(log.start, count)
+        data = savestate.save(session)
+        report(f'{count} monsters, save', time_per_call(lambda: savestate.save(session), REPEATS), 'ms')
+        report(f'{count} monsters, load', time_per_call(lambda: savestate.load(session, data), REPEATS), 'ms')
+        report(f'{count} monsters, size', len(data), 'bytes')
+
+        session = new_session(log.start, count)
+        play(session, log, 0, SAVE_TICK)
+        saved = savestate.save(session)
+        cell = (session.map.current_x, session.map.current_y)
+        play(session, log, SAVE_TICK, len(log))
+        live = savestate.save(session)
+        loaded = new_session(log.start, 0)
+        savestate.load(loaded, saved)
+        play(loaded, log, SAVE_TICK, len(log))
+        print(f'rollback from cell {cell[0]},{cell[1]} over {len(log) - SAVE_TICK} ticks replays identically: '
+              f'{savestate.save(loaded) == live}')
+
+if __name__ == '__main__':
+    main()
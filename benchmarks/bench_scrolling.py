@@ -0,0 +1,52 @@
+# Frame time of a camera panning across small and large scrolling worlds; the cost should
+# depend on the viewport, not on the number of cells
+import sys
+import tempfile
+import time
+
+from common import setup_headless, report, write_world
+
+setup_headless()
+
+import byggespillet as game
+from profiler import EventFrameTimer
+from session import Session
+from world import Map
+
+game.setup()
+
+GRIDS = [int(arg) for arg in sys.argv[1:]] or [8, 48]
+FRAMES = 600
+STEP = (9, 5)  # Pixels the players move per frame
+
+def pan(directory):
+    game.background_cache.invalidate()
+    game_map = Map(1, 1, directory, lazy=True, prepare=True, scrolling=True, backgrounds=game.background_cache)
+    session = game.session = Session(game_map, game.assets, profiler=game.profiler)
+    game.render_frame()  # The first frame loads and draws the starting window
+    game_map.transition_timer = EventFrameTimer()
+    frame_times = []
+    for _ in range(FRAMES):
+        start = time.perf_counter()
+        game_map.transition_timer.start()
+        for player in (session.player1, session.player2):
+            player.rect.move_ip(STEP)
+        session.focus_on(*session.players_center())
+        game.render_frame()
+        frame_times.append(time.perf_counter() - start)
+        time.sleep(0.002)  # Leave the preparation thread the time a frame would
+    return frame_times, game_map
+
+def main():
+    for grid in GRIDS:
+        with tempfile.TemporaryDirectory() as directory:
+            print(f'writing {grid}x{grid} map cells...')
+            write_world(directory, grid, monster_every=3)
+            frame_times, game_map = pan(directory)
+        report(f'{grid}x{grid} mean frame', sum(frame_times) * 1000 / len(frame_times))
+        report(f'{grid}x{grid} worst frame', max(frame_times) * 1000)
+        report(f'{grid}x{grid} worst cell crossing', game_map.transition_timer.worst * 1000)
+        print('cells crossed:', game_map.transition_timer.events, 'cache:', game_map.cache_stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Bullet-vs-monster collision queries: spritecollideany per bullet versus the spatial hash
+import random
+
+from common import setup_headless, time_per_call, report, wait_for_preparation
+
+setup_headless()
+
+import pygame
+import byggespillet as game
+from entities import EnemyGroup
+from session import Monster
+from spatial import SpatialHash, rect_arrays
+
+session = game.setup()
+wait_for_preparation(session.map)
+
+COUNTS = (50, 100, 300, 1000, 3000)
+FRAMES = 10
+
+def main():
+    rng = random.Random(0)
+    for count in COUNTS:
+        monsters = EnemyGroup(*[Monster(session, rng.randrange(1000), rng.randrange(1000)) for _ in range(count)])
+        bullets = pygame.sprite.Group()
+        for _ in range(count):
+            bullet = pygame.sprite.Sprite(bullets)
+            bullet.rect = game.assets.get('bullet').get_rect(topleft=(rng.randrange(1000), rng.randrange(1000)))
+
+        def pairwise():
+            return [pygame.sprite.spritecollideany(bullet, monsters) for bullet in bullets]
+
+        def hashed():
+            spatial_hash = SpatialHash(game.TILE_SIZE)
+            spatial_hash.rebuild(*monsters.bounds()[1:])
+            return spatial_hash.query_pairs(*rect_arrays([bullet.rect for bullet in bullets]))
+
+        # One untimed call each first, so first-call costs do not count against the first size
+        pairwise()
+        hashed()
+        report(f'{count} x {count}, spritecollideany', time_per_call(pairwise, FRAMES))
+        report(f'{count} x {count}, spatial hash', time_per_call(hashed, FRAMES))
+
+if __name__ == '__main__':
+    main()
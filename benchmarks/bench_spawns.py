@@ -0,0 +1,48 @@
+# Entering a cell: scanning the overlay pixels versus bulk spawning from a compiled spawn table
+import sys
+
+import numpy as np
+
+from common import setup_headless, report, time_per_call
+
+setup_headless()
+
+import byggespillet as game
+from session import Bunny, Monster
+from tiles import Tile, compile_spawns
+
+session = game.setup()
+
+CELL = 32
+REPEATS = 200
+
+# The per-pixel scan spawn_monsters used before spawn tables
+def pixel_scan(overlays):
+    for overlay in overlays:
+        rows = overlay.tolist()
+        for y, row in enumerate(rows):
+            for x, tile in enumerate(row):
+                if tile == Tile.MONSTER:
+                    session.monsters.add(Monster(session, x * game.TILE_SIZE, y * game.TILE_SIZE))
+                elif tile == Tile.BUNNY:
+                    session.monsters.add(Bunny(session, x * game.TILE_SIZE, y * game.TILE_SIZE))
+
+def enter(spawn):
+    spawn()
+    session.monsters.empty()
+
+def main():
+    session.monsters.empty()
+    rng = np.random.default_rng(0)
+    for count in (int(arg) for arg in sys.argv[1:] or ('10', '100', '500')):
+        overlay = np.zeros((CELL, CELL), dtype=np.uint8)
+        spots = rng.choice(CELL * CELL, count, replace=False)
+        overlay.flat[spots] = rng.choice([Tile.MONSTER, Tile.BUNNY, Tile.ITEM], count)
+        table = compile_spawns([overlay], game.TILE_SIZE)
+        print(f'{count} spawns, table {table.nbytes} bytes')
+        report('pixel scan', time_per_call(lambda: enter(lambda: pixel_scan([overlay])), REPEATS), 'ms/cell')
+        report('compile table', time_per_call(lambda: compile_spawns([overlay], game.TILE_SIZE), REPEATS), 'ms/cell')
+        report('spawn from table', time_per_call(lambda: enter(lambda: session.spawn_from(table)), REPEATS), 'ms/cell')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Picking the closest player for many enemies: squared distances to every player each tick
+# versus the cached tile partition of the target map, and how often enemies change targets
+# and the map is recomputed in a scripted game
+import sys
+
+from common import setup_headless, time_per_call, report
+
+setup_headless()
+
+import numpy as np
+from assets import AssetManager
+from flowfield import TargetMap
+from runner import scripted_log
+from session import Bunny, Monster, Session
+from world import TILE_SIZE, Map
+
+COUNTS = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+REPEATS = 50
+GAME_TICKS = 3600
+GRID = (96, 96)
+GAME_MONSTERS = 200
+
+def squared_distances(x, y, target_x, target_y):
+    distances = (x[:, None] - target_x[None, :]) ** 2 + (y[:, None] - target_y[None, :]) ** 2
+    return len(target_x) - 1 - np.argmin(distances[:, ::-1], axis=1)
+
+# Extra enemies on the far side of the cell from the players, as a new game only brings the overlay's
+def add_monsters(session):
+    session.monsters.add(*[(Monster if i % 2 else Bunny)(session, 480 + i * 37 % 480, 64 + i * 53 % 896)
+                           for i in range(GAME_MONSTERS)])
+
+def main():
+    rng = np.random.default_rng(0)
+    target_x = np.array([300, 2000])
+    target_y = np.array([500, 1200])
+    sources = list(zip((target_x // TILE_SIZE).tolist(), (target_y // TILE_SIZE).tolist()))
+    target_map = TargetMap(TILE_SIZE)
+    for count in COUNTS:
+        x = rng.integers(0, GRID[1] * TILE_SIZE, count)
+        y = rng.integers(0, GRID[0] * TILE_SIZE, count)
+        report(f'{count} enemies, squared distances', time_per_call(lambda: squared_distances(x, y, target_x, target_y), REPEATS), 'ms/tick')
+
+        def lookup():
+            target_map.update(GRID, sources, (0, 1))
+            return target_map.nearest_at(x, y)
+        report(f'{count} enemies, target map', time_per_call(lookup, REPEATS), 'ms/tick')
+
+    session = Session(Map(6, 9), AssetManager(()))
+    add_monsters(session)
+    log = scripted_log(0, GAME_TICKS)
+    reassigned = 0
+    for tick in range(GAME_TICKS):
+        keys, shooters = log.tick(tick)
+        players = (session.player1, session.player2)
+        session.tick(keys, [players[index] for index in shooters])
+        reassigned += session.monsters.reassigned
+        if session.over:
+            session.new_game()
+            add_monsters(session)
+    report(f'{GAME_MONSTERS} enemies game, reassignments', reassigned / GAME_TICKS, 'per tick')
+    report(f'{GAME_MONSTERS} enemies game, map recomputes', session.target_map.recomputes / GAME_TICKS, 'per tick')
+
+if __name__ == '__main__':
+    main()
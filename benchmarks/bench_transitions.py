@@ -0,0 +1,53 @@
+# Worst and mean frame time of map transitions, entered synchronously versus from cells
+# prepared in the background
+import sys
+import time
+
+from common import setup_headless, report
+
+setup_headless()
+
+import byggespillet as game
+from profiler import EventFrameTimer
+
+session = game.setup()
+
+CROSSINGS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+FRAMES_BETWEEN = 10  # Ordinary frames while the player walks to the next edge
+
+def frame(direction=None):
+    session.map.transition_timer.start()
+    if direction is not None:
+        session.move_to_adjacent_map(direction)
+    game.render_frame()
+
+def cross(prepare):
+    game_map = session.map
+    game_map.prepare = prepare
+    game_map.current_x, game_map.current_y = 6, 9
+    game_map.enter_current_cell()
+    game_map.transition_timer = EventFrameTimer()
+    session.new_game()
+    ordinary = EventFrameTimer()
+    for i in range(CROSSINGS):
+        for _ in range(FRAMES_BETWEEN):
+            ordinary.start()
+            ordinary.mark()
+            frame()
+            ordinary.end()
+            time.sleep(0.005)
+        # Drop the cached backgrounds, as if the cell was not visited recently
+        game.background_cache.invalidate()
+        frame('right' if i % 2 == 0 else 'left')
+    return game_map.transition_timer.stats(), ordinary.stats()
+
+def main():
+    for name, prepare in (('synchronous', False), ('prepared', True)):
+        transitions, ordinary = cross(prepare)
+        report(f'{name} ordinary mean', ordinary['mean_ms'])
+        report(f'{name} transition mean', transitions['mean_ms'])
+        report(f'{name} transition worst', transitions['worst_ms'])
+    print('preparation stats:', session.map.preparation_stats())
+
+if __name__ == '__main__':
+    main()
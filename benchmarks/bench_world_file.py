@@ -0,0 +1,46 @@
+# Startup and cell access time for the PNG directory versus the packed, memory-mapped world file
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import setup_headless, report, write_world
+
+setup_headless()
+
+import byggespillet as game
+from worldfile import convert_directory
+
+GRID = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+LOOKUPS = 10000
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'writing {GRID}x{GRID} map cells...')
+        write_world(directory, GRID, monster_every=5)
+        path = os.path.join(directory, 'world.bygw')
+
+        start = time.perf_counter()
+        convert_directory(directory, path)
+        report('convert PNG directory', (time.perf_counter() - start) * 1000, 'ms')
+        report('packed file size', os.path.getsize(path) / GRID ** 2, 'bytes/cell')
+
+        start = time.perf_counter()
+        game.Map(0, 0, directory)
+        report('PNG directory startup', (time.perf_counter() - start) * 1000, 'ms')
+
+        start = time.perf_counter()
+        world = game.Map(0, 0, world_file=path)
+        world.get_current_map()
+        report('packed world startup', (time.perf_counter() - start) * 1000, 'ms')
+
+        rng = random.Random(0)
+        cells = [(rng.randrange(GRID), rng.randrange(GRID)) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for x, y in cells:
+            world.world.cell(x, y)
+        report('packed cell view', (time.perf_counter() - start) * 1e6 / LOOKUPS, 'us/cell')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Compiling a GRID x GRID world: a cold build with one worker and with one per CPU, a rebuild
+# from the content-hash cache, and a rebuild after editing a single cell
+import os
+import sys
+import tempfile
+import time
+
+from common import setup_headless, report, write_world
+
+setup_headless()
+
+from PIL import Image
+from worldcompiler import compile_world
+
+GRID = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+def timed_build(directory, workers, cache=True):
+    cache_path = os.path.join(directory, 'cache.npz') if cache else ''
+    start = time.perf_counter()
+    result = compile_world(os.path.join(directory, 'maps'), os.path.join(directory, 'world.bygw'),
+                           cache_path, workers, (0, 0))
+    return time.perf_counter() - start, result
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        maps = os.path.join(directory, 'maps')
+        os.makedirs(maps)
+        print(f'writing {GRID}x{GRID} map cells...')
+        write_world(maps, GRID, monster_every=10)
+
+        seconds, result = timed_build(directory, 1, cache=False)
+        report('cold build, 1 worker', seconds, 's')
+        seconds, result = timed_build(directory, os.cpu_count())
+        report(f'cold build, {os.cpu_count()} workers', seconds, 's')
+        seconds, result = timed_build(directory, os.cpu_count())
+        report('cached rebuild', seconds, 's')
+
+        Image.new('RGB', (32, 32), (0, 255, 0)).save(os.path.join(maps, '0-0-map.png'))
+        seconds, result = timed_build(directory, os.cpu_count())
+        report(f'rebuild, {result["compiled"]} cell changed', seconds, 's')
+        print(f'{result["cells"]} cells: {len(result["errors"])} errors, {len(result["warnings"])} warnings')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run pygame without a window and import the game from the repository root
+def setup_headless():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+# Average time of one call in milliseconds
+def time_per_call(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+# Wait for the cells that setup() started preparing in the background, so the preparation
+# thread does not compete with the first measurements
+def wait_for_preparation(game_map):
+    for future in list(game_map.prepared.values()):
+        future.result()
+
+def report(name, ms, unit='ms/frame'):
+    print(f'{name:<32} {ms:10.3f} {unit}')
+
+# Write a GRID x GRID world of random map cells, with a monster overlay on every few cells
+def write_world(directory, grid, cell=32, monster_every=0):
+    from PIL import Image
+
+    rng = random.Random(0)
+    for x in range(grid):
+        for y in range(grid):
+            image = Image.new('RGB', (cell, cell), (0, 255, 0))
+            for _ in range(cell * 4):
+                image.putpixel((rng.randrange(cell), rng.randrange(cell)), (128, 128, 128))
+            image.save(os.path.join(directory, f'{x}-{y}-map.png'))
+            if monster_every and (x * grid + y) % monster_every == 0:
+                overlay = Image.new('RGBA', (cell, cell), (0, 0, 0, 0))
+                for _ in range(4):
+                    overlay.putpixel((rng.randrange(cell), rng.randrange(cell)), (255, 0, 0, 255))
+                overlay.save(os.path.join(directory, f'{x}-{y}-monster.png'))
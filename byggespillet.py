@@ -1,452 +1,425 @@
 import pygame
-import math
 import sys
 import os
-from PIL import Image
-
-# Initialize Pygame
-pygame.init()
+from collections import OrderedDict, defaultdict
+import numpy as np
+from assets import AssetManager
+from camera import Camera
+from gameloop import TICK_RATE, FixedTimestepLoop
+from network import DEFAULT_PORT, Connection, RemoteGame
+from profiler import Profiler
+from render import DisplayTarget
+from replay import InputLog
+import savestate
+from session import PLAYER1_CONTROLS, PLAYER2_CONTROLS, Session
+from tiles import Tile
+from world import SCREEN_HEIGHT, SCREEN_WIDTH, TILE_SIZE, Map
+from worldfile import WORLD_FILE
+
+# Value given after a command line option, e.g. --replay session.bin
+def command_line_option(name, default=None):
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+# Run without a window when simulating headless; the driver only has to be set before
+# setup() starts the display
+HEADLESS = '--headless' in sys.argv
+if HEADLESS:
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
 
 # Constants
-SCREEN_WIDTH = 1024
-SCREEN_HEIGHT = 1024
-TILE_SIZE = 32
-PLAYER_SPEED = TILE_SIZE // 10  # Adjusted speed
-BULLET_SPEED = 5
-MONSTER_SPEED = TILE_SIZE // 20  # Adjusted speed for monsters
-
-# Load images
-player_image = pygame.image.load('player.png')
-player2_image = pygame.image.load('player2.png')
-grass_image = pygame.image.load('grass.png')
-stone_image = pygame.image.load('stone.png')
-bullet_image = pygame.image.load('bullet.png')
-monster_image = pygame.image.load('monster.png')
-bunny_image = pygame.image.load('bunny.png')
-
-class Map:
-    def __init__(self, start_x, start_y):
-        self.current_x = start_x
-        self.current_y = start_y
-        self.maps = {}
-        self.overlays = {}
-        self.load_all_maps()
-        self.load_all_overlays()
-
-    def load_all_maps(self):
-        for filename in os.listdir('maps'):
-            if filename.endswith('-map.png'):
-                parts = filename[:-8].split('-')
-                if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-                    x, y = int(parts[0]), int(parts[1])
-                    self.maps[(x, y)] = self.load_map_from_png(os.path.join('maps', filename))
-
-    def load_map_from_png(self, file_path):
-        image = Image.open(file_path)
-        pixels = image.load()
-        width, height = image.size
-        game_map = []
-        for y in range(height):
-            row = []
-            for x in range(width):
-                r, g, b = pixels[x, y][:3]
-                if (r, g, b) == (128, 128, 128):  # Grey color for stone tiles
-                    row.append('s')
-                elif (r, g, b) == (0, 255, 0):  # Green color for grass tiles
-                    row.append('g')
-                else:
-                    row.append('g')  # Default to grass if color is not recognized
-            game_map.append(row)
-        return game_map
-
-    def load_all_overlays(self):
-        for filename in os.listdir('maps'):
-            if filename.endswith('-monster.png'):
-                parts = filename[:-12].split('-')
-                if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-                    x, y = int(parts[0]), int(parts[1])
-                    if (x, y) not in self.overlays:
-                        self.overlays[(x, y)] = []
-                    self.overlays[(x, y)].append(self.load_overlay_from_png(os.path.join('maps', filename)))
-
-    def load_overlay_from_png(self, file_path):
-        image = Image.open(file_path)
-        pixels = image.load()
-        width, height = image.size
-        overlay = []
-        for y in range(height):
-            row = []
-            for x in range(width):
-                r, g, b = pixels[x, y][:3]
-                if (r, g, b) == (255, 0, 0):  # Red color for monsters
-                    row.append('m')
-                elif (r, g, b) == (255, 255, 0):  # Yellow color for bunnies
-                    row.append('b')
-                elif (r, g, b) == (0, 0, 255):  # Blue color for items
-                    row.append('i')
-                else:
-                    row.append(None)  # No overlay
-            overlay.append(row)
-        return overlay
-
-    def get_current_map(self):
-        return self.maps.get((self.current_x, self.current_y))
-
-    def get_current_overlays(self):
-        return self.overlays.get((self.current_x, self.current_y), [])
-
-    def move_to_adjacent_map(self, direction):
-        # Clear current monsters
-        monsters.empty()
-
-        # Move to the new map
-        if direction == 'left':
-            self.current_x -= 1
-        elif direction == 'right':
-            self.current_x += 1
-        elif direction == 'up':
-            self.current_y -= 1
-        elif direction == 'down':
-            self.current_y += 1
-
-        # Spawn monsters for the new map
-        self.spawn_monsters(self.get_current_overlays())
-        return self.get_current_map(), self.get_current_overlays()
-    
-    def get_current_overlays(self):
-        overlays = self.overlays.get((self.current_x, self.current_y), [])
-        return overlays
-
-    def spawn_monsters(self, overlays):
-        for overlay in overlays:
-            for y, row in enumerate(overlay):
-                for x, tile in enumerate(row):
-                    if tile == 'm':  # 'm' for monster
-                        monsters.add(Monster(x * TILE_SIZE, y * TILE_SIZE))
-                    elif tile == 'b':  # 'b' for bunny
-                        monsters.add(Bunny(x * TILE_SIZE, y * TILE_SIZE))
-
-game_map = Map(6, 9)  # Initialize with starting map coordinates
-
-# Create screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('Top-Down Game')
-
-# Bullet class
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, direction):
-        super().__init__()
-        self.image = bullet_image
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-        self.direction = direction
-    
-    def update(self):
-        if self.direction == 'left':
-            self.rect.x -= BULLET_SPEED
-        elif self.direction == 'right':
-            self.rect.x += BULLET_SPEED
-        elif self.direction == 'up':
-            self.rect.y -= BULLET_SPEED
-        elif self.direction == 'down':
-            self.rect.y += BULLET_SPEED
-        
-        # Check for collision with stone tiles
-        if self.collides_with_stone():
-            self.kill()
-    
-    def collides_with_stone(self):
-        tile_x = self.rect.centerx // TILE_SIZE
-        tile_y = self.rect.centery // TILE_SIZE
-        if game_map.get_current_map()[tile_y][tile_x] == 's':
-            return True
-        return False
-
-# Player class
-class Player(pygame.sprite.Sprite):
-    def __init__(self, x, y, controls, image):
-        super().__init__()
-        self.image = image
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-        self.direction = 'down'
-        self.controls = controls
-    
-    def update(self, keys):
-        new_x, new_y = self.rect.topleft
-        if keys[self.controls['left']]:
-            new_x -= PLAYER_SPEED
-            self.direction = 'left'
-        if keys[self.controls['right']]:
-            new_x += PLAYER_SPEED
-            self.direction = 'right'
-        if keys[self.controls['up']]:
-            new_y -= PLAYER_SPEED
-            self.direction = 'up'
-        if keys[self.controls['down']]:
-            new_y += PLAYER_SPEED
-            self.direction = 'down'
-
-        # Check for collision with stone tiles
-        if not self.collides_with_stone(new_x, new_y):
-            self.rect.topleft = (new_x, new_y)
-
-        # Check if player exits the map and load the adjacent map
-        if self.rect.right > SCREEN_WIDTH - 30:
-            game_map.move_to_adjacent_map('right')
-            self.rect.left = 32
-            player1.rect.topleft = self.rect.topleft
-            player2.rect.topleft = self.rect.topleft
-        elif self.rect.left < 30:
-            game_map.move_to_adjacent_map('left')
-            self.rect.right = SCREEN_WIDTH - 32
-            player1.rect.topleft = self.rect.topleft
-            player2.rect.topleft = self.rect.topleft
-        elif self.rect.bottom > SCREEN_HEIGHT - 30:
-            game_map.move_to_adjacent_map('down')
-            self.rect.top = 32
-            player1.rect.topleft = self.rect.topleft
-            player2.rect.topleft = self.rect.topleft
-        elif self.rect.top < 30:
-            game_map.move_to_adjacent_map('up')
-            self.rect.bottom = SCREEN_HEIGHT - 32
-            player1.rect.topleft = self.rect.topleft
-            player2.rect.topleft = self.rect.topleft
-
-    
-    def collides_with_stone(self, x, y):
-        corners = [
-            (x, y),
-            (x + self.rect.width - 1, y),
-            (x, y + self.rect.height - 1),
-            (x + self.rect.width - 1, y + self.rect.height - 1)
-        ]
-        for corner in corners:
-            tile_x = corner[0] // TILE_SIZE
-            tile_y = corner[1] // TILE_SIZE
-            if game_map.get_current_map()[tile_y][tile_x] == 's':
-                return True
-        return False
-    
-    def shoot(self):
-        if self.direction == 'left':
-            bullet = Bullet(self.rect.left, self.rect.centery - 2, 'left')
-        elif self.direction == 'right':
-            bullet = Bullet(self.rect.right, self.rect.centery - 2, 'right')
-        elif self.direction == 'up':
-            bullet = Bullet(self.rect.centerx - 5, self.rect.top, 'up')
-        elif self.direction == 'down':
-            bullet = Bullet(self.rect.centerx - 5, self.rect.bottom, 'down')
-        bullets.add(bullet)
-
-class Bunny(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = bunny_image
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-    
-    def update(self):
-        # Determine the closest player
-        if player1.alive() and player2.alive():
-            distance_to_player1 = math.sqrt((self.rect.x - player1.rect.x) ** 2 + (self.rect.y - player1.rect.y) ** 2)
-            distance_to_player2 = math.sqrt((self.rect.x - player2.rect.x) ** 2 + (self.rect.y - player2.rect.y) ** 2)
-            target_player = player1 if distance_to_player1 < distance_to_player2 else player2
-        elif player1.alive():
-            target_player = player1
-        elif player2.alive():
-            target_player = player2
-        else:
-            return  # No players alive, no need to move
-        
-        # Move towards the closest player
-        if target_player.rect.x < self.rect.x:
-            new_x = self.rect.x - MONSTER_SPEED
-        elif target_player.rect.x > self.rect.x:
-            new_x = self.rect.x + MONSTER_SPEED
-        else:
-            new_x = self.rect.x
-        
-        if target_player.rect.y < self.rect.y:
-            new_y = self.rect.y - MONSTER_SPEED
-        elif target_player.rect.y > self.rect.y:
-            new_y = self.rect.y + MONSTER_SPEED
-        else:
-            new_y = self.rect.y
-        
-        # Check for collision with stone tiles
-        if not self.collides_with_stone(new_x, new_y):
-            self.rect.topleft = (new_x, new_y)
-        
-        # Check for collision with players
-        if self.rect.colliderect(player1.rect):
-            player1.kill()
-        if self.rect.colliderect(player2.rect):
-            player2.kill()
-        
-        # Check if both players are dead
-        if not player1.alive() and not player2.alive():
-            game_over()
-    
-    def collides_with_stone(self, x, y):
-        # Check all four corners of the bunny's bounding box
-        corners = [
-            (x, y),
-            (x + self.rect.width - 1, y),
-            (x, y + self.rect.height - 1),
-            (x + self.rect.width - 1, y + self.rect.height - 1)
-        ]
-        for corner in corners:
-            tile_x = corner[0] // TILE_SIZE
-            tile_y = corner[1] // TILE_SIZE
-            if game_map.get_current_map()[tile_y][tile_x] == 's':
-                return True
-        return False
-
-
-# Monster class
-class Monster(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = monster_image
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-    
-    def update(self):
-        # Determine the closest player
-        if player1.alive() and player2.alive():
-            distance_to_player1 = math.sqrt((self.rect.x - player1.rect.x) ** 2 + (self.rect.y - player1.rect.y) ** 2)
-            distance_to_player2 = math.sqrt((self.rect.x - player2.rect.x) ** 2 + (self.rect.y - player2.rect.y) ** 2)
-            target_player = player1 if distance_to_player1 < distance_to_player2 else player2
-        elif player1.alive():
-            target_player = player1
-        elif player2.alive():
-            target_player = player2
+MAX_FPS = 60  # Frame rate cap when rendering
+HEADLESS_TICKS = 10000  # Ticks simulated by --headless before exiting
+INTERPOLATE = '--interpolate' in sys.argv  # Draw sprites between simulation ticks
+RECORD_FILE = command_line_option('--record')  # Write the session's input log here
+REPLAY_FILE = command_line_option('--replay')  # Play back an input log instead of reading the keyboard
+CONNECT = command_line_option('--connect')  # Play on a server, given as host or host:port
+LOAD_FILE = command_line_option('--load')  # Start from a saved game
+PROFILE_FILE = command_line_option('--profile-out')  # Write per-frame timings to a .csv or .jsonl file
+PROFILER_KEY = pygame.K_F3  # Toggles the performance overlay
+SAVE_KEY = pygame.K_F5  # Saves the game to savestate.SAVE_FILE
+LOAD_KEY = pygame.K_F9  # Replaces the game with the last save
+BACKGROUND_CACHE_SIZE = 16  # Number of pre-rendered map backgrounds kept in memory
+DIRTY_RENDERING = '--dirty' in sys.argv  # Only update the screen areas that changed
+LAZY_LOADING = '--lazy' in sys.argv  # Decode map cells on first use instead of at startup
+PACKED_WORLD = '--packed' in sys.argv  # Read the world from the packed world file instead of maps/
+SCROLLING = '--scroll' in sys.argv  # Scroll a camera over a seamless world instead of switching screens
+PREPARE_CELLS = '--sync-transitions' not in sys.argv  # Prepare neighbouring cells in the background
+KEEP_CELL_STATE = '--persistent-cells' in sys.argv  # Revisited cells keep their surviving enemies
+
+# Sprites packed into the texture atlas, loaded once the screen exists
+SPRITES = ('player', 'player2', 'grass', 'stone', 'bullet', 'monster', 'bunny')
+assets = AssetManager(SPRITES)
+
+# The display and the game shown on it, both created by setup(). Frames are drawn on
+# screen and shown by the render target, a window unless setup() is given another one.
+render_target = DisplayTarget()
+screen = None
+session = None
+last_background = None
+
+# Draw the tiles of a map grid onto a surface, one blit per tile
+def draw_tiles(surface, tiles, sprites=assets):
+    grass_image = sprites.get('grass')
+    stone_image = sprites.get('stone')
+    for (y, x), tile in np.ndenumerate(tiles):
+        if tile == Tile.GRASS:
+            surface.blit(grass_image, (x * TILE_SIZE, y * TILE_SIZE))
+        elif tile == Tile.STONE:
+            surface.blit(stone_image, (x * TILE_SIZE, y * TILE_SIZE))
+
+# Render a whole map grid into a single surface in the display format
+def render_background(tiles, sprites=assets):
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    background.fill((0, 0, 0))
+    draw_tiles(background, tiles, sprites)
+    return background
+
+# Pre-rendered map backgrounds, kept per map cell with LRU eviction
+class BackgroundCache:
+    def __init__(self, max_size=BACKGROUND_CACHE_SIZE, render=render_background):
+        self.max_size = max_size
+        self.render = render
+        self.surfaces = OrderedDict()
+
+    def get(self, game_map):
+        return self.get_cell((game_map.current_x, game_map.current_y), game_map.get_current_map())
+
+    # Background of any cell, None where the world has no cell
+    def get_cell(self, key, tiles):
+        if tiles is None:
+            return None
+        entry = self.surfaces.get(key)
+        # Rebuild only if the cell is new or its tile grid was replaced
+        if entry is None or entry[0] is not tiles:
+            return self.store(key, tiles, self.render(tiles))
+        self.surfaces.move_to_end(key)
+        return entry[1]
+
+    # Add a background rendered elsewhere, e.g. by the cell preparation thread
+    def store(self, key, tiles, background):
+        self.surfaces[key] = (tiles, background)
+        self.surfaces.move_to_end(key)
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return background
+
+    def invalidate(self, key=None):
+        if key is None:
+            self.surfaces.clear()
         else:
-            return  # No players alive, no need to move
-        
-        # Move towards the closest player
-        if target_player.rect.x < self.rect.x:
-            new_x = self.rect.x - MONSTER_SPEED
-        elif target_player.rect.x > self.rect.x:
-            new_x = self.rect.x + MONSTER_SPEED
-        else:
-            new_x = self.rect.x
-        
-        if target_player.rect.y < self.rect.y:
-            new_y = self.rect.y - MONSTER_SPEED
-        elif target_player.rect.y > self.rect.y:
-            new_y = self.rect.y + MONSTER_SPEED
-        else:
-            new_y = self.rect.y
-        
-        # Check for collision with stone tiles
-        if not self.collides_with_stone(new_x, new_y):
-            self.rect.topleft = (new_x, new_y)
-        
-        # Check for collision with players
-        if self.rect.colliderect(player1.rect):
-            player1.kill()
-        if self.rect.colliderect(player2.rect):
-            player2.kill()
-        
-        # Check if both players are dead
-        if not player1.alive() and not player2.alive():
-            game_over()
-    
-    def collides_with_stone(self, x, y):
-        # Check all four corners of the monster's bounding box
-        corners = [
-            (x, y),
-            (x + self.rect.width - 1, y),
-            (x, y + self.rect.height - 1),
-            (x + self.rect.width - 1, y + self.rect.height - 1)
-        ]
-        for corner in corners:
-            tile_x = corner[0] // TILE_SIZE
-            tile_y = corner[1] // TILE_SIZE
-            if game_map.get_current_map()[tile_y][tile_x] == 's':
-                return True
-        return False
+            self.surfaces.pop(key, None)
+
+background_cache = BackgroundCache()
+camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+# Counts the pixels sent to the display each frame
+class PixelCounter:
+    def __init__(self):
+        self.last = 0
+        self.total = 0
+        self.frames = 0
+
+    def add(self, rects):
+        self.last = sum(rect.width * rect.height for rect in rects)
+        self.total += self.last
+        self.frames += 1
+
+    def average(self):
+        return self.total / self.frames if self.frames else 0
+
+pixel_counter = PixelCounter()
+
+# Timers around the parts of a frame, shown in the overlay and exported with --profile-out
+profiler = Profiler(['events', 'players', 'bullets', 'monsters', 'collision', 'tiles', 'sprites', 'flip'],
+                    ['monsters', 'bullets'])
+show_overlay = False
+overlay_rect = None
+overlay_font = None
+
+
+# Open the display and start a game on it. Nothing is shown before this is called, so
+# the module can be imported, e.g. by benchmarks, without opening a window.
+def setup(start=None, target=None):
+    global render_target, screen, session, last_background
+    pygame.init()
+    if target is not None:
+        render_target = target
+    screen = render_target.open((SCREEN_WIDTH, SCREEN_HEIGHT), 'Top-Down Game')
+    # Headless runs draw nothing, so there are no backgrounds to prepare
+    game_map = Map(6, 9, lazy=LAZY_LOADING, world_file=WORLD_FILE if PACKED_WORLD else None,
+                   prepare=PREPARE_CELLS, keep_state=KEEP_CELL_STATE, scrolling=SCROLLING,
+                   backgrounds=None if HEADLESS else background_cache)
+    session = Session(game_map, assets, start, profiler)
+    last_background = None
+    return session
 
 
 def game_over():
-    font = pygame.font.Font(None, 74)
-    text = font.render('Game Over', True, (255, 0, 0))
-    screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 - text.get_height() // 2))
-    pygame.display.flip()
-    pygame.time.wait(2000)
-    main()
+    global last_background
+    if RECORD_FILE or REPLAY_FILE:
+        # A recorded session ends with the game
+        quit_game()
+    if not HEADLESS:
+        font = pygame.font.Font(None, 74)
+        text = font.render('Game Over', True, (255, 0, 0))
+        screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 - text.get_height() // 2))
+        render_target.present()
+        pygame.time.wait(2000)
+    # Start over in place; the running loop picks up the new game
+    session.new_game()
+    # Force a full redraw on the first frame
+    last_background = None
+
+
+# Move the sprites between their previous and current tick positions for drawing,
+# returns what is needed to move them back
+def interpolate_sprites(alpha):
+    restore = []
+    for player in session.player_group:
+        previous_x, previous_y = player.previous_topleft
+        # Do not smear players across the screen when they change map
+        if abs(player.rect.x - previous_x) + abs(player.rect.y - previous_y) <= TILE_SIZE:
+            restore.append((player, player.rect.topleft))
+            player.rect.x = round(previous_x + (player.rect.x - previous_x) * alpha)
+            player.rect.y = round(previous_y + (player.rect.y - previous_y) * alpha)
+    session.bullets.interpolate(alpha)
+    return restore + session.monsters.interpolate(alpha)
+
+
+# Draw the timer percentiles and entity counts in the top left corner
+def draw_overlay():
+    global overlay_font
+    if overlay_font is None:
+        overlay_font = pygame.font.SysFont('monospace', 14)
+    lines = ['timer        p50    p95    p99 ms']
+    for name, (p50, p95, p99) in profiler.summary().items():
+        lines.append(f'{name:<10} {p50:6.2f} {p95:6.2f} {p99:6.2f}')
+    lines.append(f'monsters {len(session.monsters)}  bullets {len(session.bullets)}  pixels {pixel_counter.last}')
+    lines.append(f'transition worst {session.map.transition_timer.worst * 1000:.2f} ms')
+    lines.append(f'retargets {session.monsters.reassigned}  target maps {session.target_map.recomputes}')
+    panel = pygame.Surface((260, 16 * len(lines) + 8), pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 180))
+    for i, line in enumerate(lines):
+        panel.blit(overlay_font.render(line, True, (255, 255, 255)), (6, 4 + 16 * i))
+    return screen.blit(panel, (8, 8))
+
+
+# Draw the map cells under the camera, each from its cached background
+def draw_chunks():
+    game_map = session.map
+    if game_map.prepare:
+        # Cells scroll into view before the next cell is entered, pick up their backgrounds early
+        game_map.collect_prepared()
+    screen.fill((0, 0, 0))
+    offset_x, offset_y = camera.offset()
+    for key in camera.visible_cells(SCREEN_WIDTH, SCREEN_HEIGHT):
+        chunk = background_cache.get_cell(key, game_map.get_cell(*key)[0])
+        if chunk is not None:
+            origin_x, origin_y = game_map.cell_origin(*key)
+            screen.blit(chunk, (origin_x + offset_x, origin_y + offset_y))
+
+
+# Draw the sprites at their world positions relative to the camera
+def draw_sprites_scrolled():
+    offset = camera.offset()
+    screen.blits([(player.image, player.rect.move(offset)) for player in session.player_group], False)
+    session.bullets.draw(screen, offset)
+    screen.blits([(monster.image, monster.rect.move(offset)) for monster in session.monsters], False)
+
+
+# Draw the background and all sprites, then push the changes to the display
+def render_frame(alpha=1.0):
+    global last_background, overlay_rect
+    game_map = session.map
+    background = None if game_map.scrolling else background_cache.get(game_map)
+    groups = (session.player_group, session.bullets, session.monsters)
+    restore = interpolate_sprites(alpha) if INTERPOLATE and alpha < 1 else []
+    # Everything moves with the camera when scrolling, so it is always a full redraw
+    full_redraw = game_map.scrolling or not DIRTY_RENDERING or background is not last_background
+    if not full_redraw:
+        # Restore the background under the sprites' previous positions only
+        with profiler.scope('tiles'):
+            for group in groups:
+                group.clear(screen, background)
+            if overlay_rect is not None:
+                screen.blit(background, overlay_rect, overlay_rect)
+        dirty_rects = [overlay_rect] if overlay_rect is not None else []
+        with profiler.scope('sprites'):
+            for group in groups:
+                dirty_rects += group.draw(screen)
+    elif game_map.scrolling:
+        camera.center_on(*session.players_center())
+        with profiler.scope('tiles'):
+            draw_chunks()
+        with profiler.scope('sprites'):
+            draw_sprites_scrolled()
+        dirty_rects = [screen.get_rect()]
+    else:
+        with profiler.scope('tiles'):
+            screen.blit(background, (0, 0))
+        with profiler.scope('sprites'):
+            for group in groups:
+                group.draw(screen)
+        dirty_rects = [screen.get_rect()]
+    overlay_rect = draw_overlay() if show_overlay else None
+    with profiler.scope('flip'):
+        if full_redraw:
+            render_target.present()
+        else:
+            if overlay_rect is not None:
+                dirty_rects.append(overlay_rect)
+            screen_rect = screen.get_rect()
+            dirty_rects = [rect.clip(screen_rect) for rect in dirty_rects]
+            render_target.present(dirty_rects)
+    last_background = background
+    pixel_counter.add(dirty_rects)
+    for sprite, topleft in restore:
+        sprite.rect.topleft = topleft
+    profiler.count('monsters', len(session.monsters))
+    profiler.count('bullets', len(session.bullets))
+    profiler.end_frame()
+    game_map.transition_timer.end()
+
+
+def quit_game():
+    if input_recorder is not None:
+        input_recorder.save(RECORD_FILE)
+    profiler.close()
+    pygame.quit()
+    sys.exit()
+
+
+# Show or hide the performance overlay; the timers only run while it is shown or exported
+def toggle_overlay():
+    global show_overlay
+    show_overlay = not show_overlay
+    profiler.enabled = show_overlay or PROFILE_FILE is not None
+
+
+# Continue the quick save in place of the running game, if there is one
+def quick_load():
+    global last_background
+    # A recording could not play back a game replaced halfway
+    if input_recorder is None and os.path.exists(savestate.SAVE_FILE):
+        savestate.load_file(session)
+        # Force a full redraw of the loaded game
+        last_background = None
+
+
+# Players whose shoot key was pressed since the last call; exits on window close
+def handle_events():
+    shooters = []
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            quit_game()
+        elif event.type == pygame.KEYDOWN:
+            if event.key == PROFILER_KEY:
+                toggle_overlay()
+            if event.key == SAVE_KEY:
+                savestate.save_file(session)
+            if event.key == LOAD_KEY:
+                quick_load()
+            if event.key == session.player1.controls['shoot']:
+                shooters.append(session.player1)
+            if event.key == session.player2.controls['shoot']:
+                shooters.append(session.player2)
+    return shooters
+
+
+# Advance the game by one simulation tick
+def simulate_tick(keys, shooters):
+    session.tick(keys, shooters)
+    if session.over:
+        game_over()
+    if HEADLESS:
+        # Nothing is rendered, so every tick is a profiler frame
+        profiler.count('monsters', len(session.monsters))
+        profiler.count('bullets', len(session.bullets))
+        profiler.end_frame()
+        session.map.transition_timer.end()
+
+
+# Simulation tick that plays back an input log, stops the loop at its end
+def replay_tick(log, loop):
+    if loop.ticks >= len(log):
+        loop.stop()
+        return
+    if not HEADLESS:
+        with profiler.scope('events'):
+            handle_events()
+    keys, shooters = log.tick(loop.ticks)
+    players = (session.player1, session.player2)
+    simulate_tick(keys, [players[index] for index in shooters])
+
+
+# Simulation tick driven by the keyboard, optionally recording the input
+def keyboard_tick():
+    with profiler.scope('events'):
+        keys = pygame.key.get_pressed()
+        shooters = handle_events()
+    if input_recorder is not None:
+        input_recorder.record(keys, [(session.player1, session.player2).index(player) for player in shooters])
+    simulate_tick(keys, shooters)
 
 
-def main():
-    global player1, player2, player_group, bullets, monsters
+# Simulation tick of a network client: the server simulates, the client sends its keys,
+# shows the server's snapshots and predicts its own player
+def network_tick(remote):
+    with profiler.scope('events'):
+        keys = pygame.key.get_pressed()
+        shooters = handle_events()
+    try:
+        remote.tick(keys, remote.own is not None and remote.own in shooters)
+    except ConnectionError:
+        quit_game()
+
 
-    # Create player instances
-    player1 = Player(2*50, 3*50, {'left': pygame.K_LEFT, 'right': pygame.K_RIGHT, 'up': pygame.K_UP, 'down': pygame.K_DOWN, 'shoot': pygame.K_RCTRL}, player_image)
-    player2 = Player(2*50, 2*50, {'left': pygame.K_a, 'right': pygame.K_d, 'up': pygame.K_w, 'down': pygame.K_s, 'shoot': pygame.K_g}, player2_image)
-    player_group = pygame.sprite.Group(player1, player2)
-    bullets = pygame.sprite.Group()
-    
-    # Create monsters
-    monsters = pygame.sprite.Group()
+input_recorder = None
 
-    game_map.spawn_monsters(game_map.get_current_overlays())
+
+def main():
+    global input_recorder
+
+    if RECORD_FILE and LOAD_FILE:
+        # An input log only starts from player positions, not from a saved game's enemies and bullets
+        sys.exit('--record cannot be combined with --load, the recording would not play back the same')
+
+    controls = [PLAYER1_CONTROLS, PLAYER2_CONTROLS]
+    replay_log = InputLog.load(REPLAY_FILE, controls) if REPLAY_FILE else None
+    setup(replay_log.start if replay_log else None)
+    if LOAD_FILE:
+        savestate.load_file(session, LOAD_FILE)
+    if RECORD_FILE:
+        input_recorder = InputLog(controls, session.start_state())
+    if PROFILE_FILE and profiler.export_file is None:
+        profiler.export_to(PROFILE_FILE)
 
     # Main game loop
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == player1.controls['shoot']:
-                    player1.shoot()
-                if event.key == player2.controls['shoot']:
-                    player2.shoot()
-        
-        # Get pressed keys
-        keys = pygame.key.get_pressed()
-        
-        # Update player positions
-        player1.update(keys)
-        player2.update(keys)
-        
-        # Update bullets
-        bullets.update()
-        
-        # Update monsters
-        monsters.update()
-        
-        # Check for bullet collisions with monsters
-        for bullet in bullets:
-            monster_hit = pygame.sprite.spritecollideany(bullet, monsters)
-            if monster_hit:
-                bullet.kill()
-                monster_hit.kill()
-        
-        # Draw everything
-        screen.fill((0, 0, 0))
-        
-        # Draw tiles from the map
-        for y, row in enumerate(game_map.get_current_map()):
-            for x, tile in enumerate(row):
-                if tile == 'g':
-                    screen.blit(grass_image, (x * TILE_SIZE, y * TILE_SIZE))
-                elif tile == 's':
-                    screen.blit(stone_image, (x * TILE_SIZE, y * TILE_SIZE))
-
-
-        # Draw players, bullets, and monsters
-        player_group.draw(screen)
-        bullets.draw(screen)
-        monsters.draw(screen)
-        
-        # Update display
-        pygame.display.flip()
-        
-        # Cap the frame rate
-        pygame.time.Clock().tick(60)
+    if CONNECT:
+        host, _, port = CONNECT.partition(':')
+        remote = RemoteGame(session, Connection(host, int(port) if port else DEFAULT_PORT))
+        loop = FixedTimestepLoop(lambda: network_tick(remote), render_frame, TICK_RATE, MAX_FPS)
+    elif replay_log is not None:
+        loop = FixedTimestepLoop(lambda: replay_tick(replay_log, loop), render_frame, TICK_RATE, MAX_FPS)
+    elif HEADLESS:
+        # No input, nothing moves but the monsters
+        no_keys = defaultdict(bool)
+        loop = FixedTimestepLoop(lambda: simulate_tick(no_keys, []))
+    else:
+        loop = FixedTimestepLoop(keyboard_tick, render_frame, TICK_RATE, MAX_FPS)
+
+    if HEADLESS:
+        # No drawing, simulate as fast as possible
+        ticks_per_second = loop.run_headless(len(replay_log) if replay_log else HEADLESS_TICKS)
+        print(f'Simulated {loop.ticks} ticks at {ticks_per_second:.0f} ticks/s')
+        transition_timer = session.map.transition_timer
+        if transition_timer.events:
+            print(f'Worst transition tick: {transition_timer.worst * 1000:.2f} ms')
+    else:
+        loop.run()
+    quit_game()
 
 if __name__ == "__main__":
     main()
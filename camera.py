@@ -0,0 +1,23 @@
+# View of a world larger than the screen, positioned in world pixels
+class Camera:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.x = 0
+        self.y = 0
+
+    def center_on(self, x, y):
+        self.x = x - self.width // 2
+        self.y = y - self.height // 2
+
+    # Screen position of the world origin, to be added to world positions when drawing
+    def offset(self):
+        return -self.x, -self.y
+
+    # Keys of the world cells of the given size that overlap the view
+    def visible_cells(self, cell_width, cell_height):
+        first_x = self.x // cell_width
+        first_y = self.y // cell_height
+        last_x = (self.x + self.width - 1) // cell_width
+        last_y = (self.y + self.height - 1) // cell_height
+        return [(x, y) for y in range(first_y, last_y + 1) for x in range(first_x, last_x + 1)]
@@ -0,0 +1,43 @@
+import numpy as np
+
+from tiles import Tile
+
+# Solidity bitmap of the current map cell, shared by every entity that collides with stone.
+# origin is the pixel position of the top left tile, for grids stitched from several cells.
+class CollisionMap:
+    def __init__(self, tile_size):
+        self.tile_size = tile_size
+        self.tiles = None
+        self.origin = (0, 0)
+        self.solid = np.zeros((0, 0), dtype=bool)
+
+    # Rebuild the bitmap when a new cell is entered
+    def load(self, tiles, origin=(0, 0)):
+        self.origin = origin
+        if tiles is not self.tiles:
+            self.tiles = tiles
+            self.solid = np.zeros((0, 0), dtype=bool) if tiles is None else tiles == Tile.STONE
+        return self
+
+    # Solidity of the tiles under many pixel positions; outside the map counts as solid
+    def solid_at(self, xs, ys):
+        tile_xs = (np.asarray(xs) - self.origin[0]) // self.tile_size
+        tile_ys = (np.asarray(ys) - self.origin[1]) // self.tile_size
+        height, width = self.solid.shape
+        inside = (tile_xs >= 0) & (tile_xs < width) & (tile_ys >= 0) & (tile_ys < height)
+        result = np.ones(np.shape(tile_xs), dtype=bool)
+        result[inside] = self.solid[tile_ys[inside], tile_xs[inside]]
+        return result
+
+    # Test the four corners of many rectangles at once
+    def collides_rects(self, xs, ys, widths, heights):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        right = xs + np.asarray(widths) - 1
+        bottom = ys + np.asarray(heights) - 1
+        corners_x = np.stack((xs, right, xs, right))
+        corners_y = np.stack((ys, ys, bottom, bottom))
+        return self.solid_at(corners_x, corners_y).any(axis=0)
+
+    def collides_rect(self, x, y, width, height):
+        return bool(self.collides_rects([x], [y], [width], [height])[0])
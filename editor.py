@@ -1,6 +1,10 @@
 import os
+from collections import OrderedDict
+import numpy as np
 import pygame
 from PIL import Image
+from tiles import MAP_COLORS, MAP_SUFFIX, OVERLAY_COLORS, OVERLAY_SUFFIX, Tile, cell_files, decode_map, decode_overlay
+from worldfile import WORLD_FILE, write_world
 
 # Constants
 SCREEN_WIDTH = 800
@@ -12,173 +16,449 @@ GREY = (128, 128, 128)
 RED = (255, 0, 0)
 ZOOM_FACTOR = 10
 YELLOW = (255, 255, 0)
+PANEL_WIDTH = 150
+FPS = 60
+SAVE_DELAY = 1000  # Milliseconds without edits before changed cells are written
+TOOLS = ('brush', 'rectangle', 'fill')
+BRUSH_SIZES = (1, 3, 5, 7)
+MAP_TILES = (Tile.GRASS, Tile.STONE)
+OVERLAY_TILES = (Tile.MONSTER, Tile.BUNNY, Tile.ITEM, Tile.EMPTY)
+OVERVIEW_SCALES = (1, 2, 4, 8, 16, 32, 64)  # Screen pixels per cell in the world overview
+CHUNK_PIXELS = 512
+OVERVIEW_CACHE_SIZE = 64  # Composed chunks kept, about 1 MB each
+PAN_STEP = 128
+PAN_KEYS = {
+    pygame.K_LEFT: (-PAN_STEP, 0),
+    pygame.K_RIGHT: (PAN_STEP, 0),
+    pygame.K_UP: (0, -PAN_STEP),
+    pygame.K_DOWN: (0, PAN_STEP),
+}
 
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('Map Editor')
+# The editor window, opened by setup() so the module can be imported without one
+screen = None
+
+# Tile arrays of the loaded cells and the layers waiting to be written
+maps = {}
+monsters = {}
+pending_writes = set()
+last_edit = 0
+
+# Lookup table from tile ids to RGB colors; unlisted tiles are black
+def palette(colors):
+    table = np.zeros((256, 3), dtype=np.uint8)
+    for tile, color in colors.items():
+        table[tile] = color
+    return table
+
+MAP_PALETTE = palette(MAP_COLORS)
+OVERLAY_PALETTE = palette(OVERLAY_COLORS)
 
 def load_maps():
     maps = {}
     monsters = {}
-    for filename in os.listdir('maps'):
-        if filename.endswith('-map.png'):
-            parts = filename[:-8].split('-')
-            if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-                x, y = int(parts[0]), int(parts[1])
-                maps[(x, y)] = pygame.image.load(os.path.join('maps', filename))
-        elif filename.endswith('-monster.png'):
-            parts = filename[:-12].split('-')
-            if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-                x, y = int(parts[0]), int(parts[1])
-                monsters[(x, y)] = pygame.image.load(os.path.join('maps', filename))
+    for key, suffix, path in cell_files('maps'):
+        if suffix == MAP_SUFFIX:
+            maps[key] = decode_map(path)
+        else:
+            monsters[key] = decode_overlay(path)
     return maps, monsters
 
+# Surface with one pixel per tile
+def tiles_surface(tiles, table):
+    return pygame.surfarray.make_surface(table[tiles].transpose(1, 0, 2))
+
+# Tiles drawn ZOOM_FACTOR times larger; empty overlay tiles are see-through
+def zoomed_surface(tiles, table, transparent=False):
+    height, width = tiles.shape
+    surface = pygame.transform.scale(tiles_surface(tiles, table), (width * ZOOM_FACTOR, height * ZOOM_FACTOR))
+    if transparent:
+        surface.set_colorkey((0, 0, 0))
+    return surface
+
 # Save map image
-def save_map(x, y, image):
-    file_path = os.path.join('maps', f'{x}-{y}-map.png')
-    pygame.image.save(image, file_path)
-    maps[(x, y)] = pygame.image.load(file_path)  # Reload the modified map
-
-# Save monster image
-def save_monster(x, y, image):
-    # Create a new image with transparency
-    transparent_image = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
-    transparent_image.fill((0, 0, 0, 0))  # Fill with transparent color
-
-    # Copy only the red and yellow pixels from the original image
-    for i in range(TILE_SIZE):
-        for j in range(TILE_SIZE):
-            color = image.get_at((i, j))[:3]
-            if color == RED or color == YELLOW:
-                transparent_image.set_at((i, j), color + (255,))  # Set pixel with full opacity
-
-    file_path = os.path.join('maps', f'{x}-{y}-monster.png')
-    pygame.image.save(transparent_image, file_path)
-    monsters[(x, y)] = pygame.image.load(file_path)  # Reload the modified monster
-
-# Draw grid
-def draw_grid():
-    for x in range(0, SCREEN_WIDTH, TILE_SIZE):
-        pygame.draw.line(screen, GRID_COLOR, (x, 0), (x, SCREEN_HEIGHT))
-    for y in range(0, SCREEN_HEIGHT, TILE_SIZE):
-        pygame.draw.line(screen, GRID_COLOR, (0, y), (SCREEN_WIDTH, y))
-
-# Create a new map image with green background and grey frame
-def create_new_map_image():
-    image = pygame.Surface((TILE_SIZE, TILE_SIZE))
-    image.fill(GREEN)
-    pygame.draw.rect(image, GREY, image.get_rect(), 1)
-    return image
+def save_map(x, y, tiles):
+    file_path = os.path.join('maps', f'{x}-{y}{MAP_SUFFIX}')
+    Image.fromarray(MAP_PALETTE[tiles]).save(file_path)
 
+# Save monster image, transparent where there is no monster, bunny or item
+def save_monster(x, y, overlay):
+    rgba = np.zeros(overlay.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = OVERLAY_PALETTE[overlay]
+    rgba[..., 3] = np.where(overlay != Tile.EMPTY, 255, 0)
+    file_path = os.path.join('maps', f'{x}-{y}{OVERLAY_SUFFIX}')
+    Image.fromarray(rgba, 'RGBA').save(file_path)
 
+# Remember that a layer of a cell changed; it is written once the edits pause
+def mark_dirty(layer, key):
+    global last_edit
+    pending_writes.add((layer, key))
+    last_edit = pygame.time.get_ticks()
 
-# Open zoomed map window
-def open_zoomed_map(image, x, y, monster_image=None):
-    zoomed_image = pygame.transform.scale(image, (image.get_width() * ZOOM_FACTOR, image.get_height() * ZOOM_FACTOR))
-    if monster_image:
-        zoomed_monster_image = pygame.transform.scale(monster_image, (monster_image.get_width() * ZOOM_FACTOR, monster_image.get_height() * ZOOM_FACTOR))
+# Write every changed layer in one go after SAVE_DELAY without edits, or right away with force
+def flush_writes(force=False):
+    if not pending_writes or (not force and pygame.time.get_ticks() - last_edit < SAVE_DELAY):
+        return
+    for layer, (x, y) in pending_writes:
+        if layer == 'map':
+            save_map(x, y, maps[(x, y)])
+        else:
+            save_monster(x, y, monsters[(x, y)])
+    pending_writes.clear()
+
+# Write all maps and monster overlays to the packed world file
+def export_world():
+    cells = {}
+    for key in maps.keys() | monsters.keys():
+        overlays = [monsters[key]] if key in monsters else []
+        cells[key] = (maps.get(key), overlays)
+    write_world(WORLD_FILE, cells, TILE_SIZE, TILE_SIZE)
+
+# Pannable, zoomable overview of the world. It is composed in square chunks at the current
+# scale; only chunks in view are built, and an edited cell is redrawn into its chunk in place.
+class Overview:
+    def __init__(self, maps, scale=TILE_SIZE, max_size=OVERVIEW_CACHE_SIZE):
+        self.maps = maps
+        self.max_size = max_size
+        self.chunks = OrderedDict()
+        self.view_x = 0  # Screen position of the view in pixels at the current scale
+        self.view_y = 0
+        self.built = 0
+        self.set_scale(scale)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.chunk_cells = CHUNK_PIXELS // scale
+        self.chunks.clear()
+
+    # Step through OVERVIEW_SCALES, keeping the point under position where it is
+    def zoom(self, steps, position):
+        index = min(max(OVERVIEW_SCALES.index(self.scale) + steps, 0), len(OVERVIEW_SCALES) - 1)
+        scale = OVERVIEW_SCALES[index]
+        if scale == self.scale:
+            return False
+        px, py = position
+        self.view_x = (self.view_x + px) * scale // self.scale - px
+        self.view_y = (self.view_y + py) * scale // self.scale - py
+        self.set_scale(scale)
+        return True
+
+    def pan(self, dx, dy):
+        self.view_x += dx
+        self.view_y += dy
+
+    def cell_at(self, position):
+        return (self.view_x + position[0]) // self.scale, (self.view_y + position[1]) // self.scale
+
+    # RGB pixels of one cell at the current scale, rows first
+    def cell_pixels(self, tiles):
+        if self.scale <= TILE_SIZE:
+            step = TILE_SIZE // self.scale
+            return MAP_PALETTE[tiles[::step, ::step]]
+        repeat = self.scale // TILE_SIZE
+        return MAP_PALETTE[tiles.repeat(repeat, 0).repeat(repeat, 1)]
+
+    def build_chunk(self, chunk_x, chunk_y):
+        rgb = np.zeros((CHUNK_PIXELS, CHUNK_PIXELS, 3), dtype=np.uint8)
+        left = chunk_x * self.chunk_cells
+        top = chunk_y * self.chunk_cells
+        scale = self.scale
+        # Look up the chunk's coordinates or walk the cells, whichever is fewer
+        if self.chunk_cells ** 2 < len(self.maps):
+            keys = [(left + x, top + y) for y in range(self.chunk_cells) for x in range(self.chunk_cells)]
+        else:
+            keys = list(self.maps)
+        for key in keys:
+            tiles = self.maps.get(key)
+            x, y = key[0] - left, key[1] - top
+            if tiles is not None and 0 <= x < self.chunk_cells and 0 <= y < self.chunk_cells:
+                rgb[y * scale:(y + 1) * scale, x * scale:(x + 1) * scale] = self.cell_pixels(tiles)
+        self.built += 1
+        return pygame.surfarray.make_surface(rgb.transpose(1, 0, 2))
+
+    def get_chunk(self, key):
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = self.build_chunk(*key)
+            while len(self.chunks) > self.max_size:
+                self.chunks.popitem(last=False)
+        self.chunks.move_to_end(key)
+        return chunk
+
+    # Redraw one cell into its chunk after it was edited or created
+    def update_cell(self, key):
+        chunk = self.chunks.get((key[0] // self.chunk_cells, key[1] // self.chunk_cells))
+        if chunk is None:
+            return
+        position = (key[0] % self.chunk_cells * self.scale, key[1] % self.chunk_cells * self.scale)
+        tiles = self.maps.get(key)
+        if tiles is None:
+            chunk.fill((0, 0, 0), (position, (self.scale, self.scale)))
+        else:
+            chunk.blit(pygame.surfarray.make_surface(self.cell_pixels(tiles).transpose(1, 0, 2)), position)
+
+    # Blit the chunks in view, then the cell grid when cells are large enough to tell apart
+    def draw(self, surface):
+        width, height = surface.get_size()
+        surface.fill((0, 0, 0))
+        for chunk_y in range(self.view_y // CHUNK_PIXELS, (self.view_y + height - 1) // CHUNK_PIXELS + 1):
+            for chunk_x in range(self.view_x // CHUNK_PIXELS, (self.view_x + width - 1) // CHUNK_PIXELS + 1):
+                surface.blit(self.get_chunk((chunk_x, chunk_y)),
+                             (chunk_x * CHUNK_PIXELS - self.view_x, chunk_y * CHUNK_PIXELS - self.view_y))
+        if self.scale >= 8:
+            for x in range(-self.view_x % self.scale, width, self.scale):
+                pygame.draw.line(surface, GRID_COLOR, (x, 0), (x, height))
+            for y in range(-self.view_y % self.scale, height, self.scale):
+                pygame.draw.line(surface, GRID_COLOR, (0, y), (width, y))
+
+# Create new map tiles: grass inside a stone frame
+def create_new_map_tiles():
+    tiles = np.full((TILE_SIZE, TILE_SIZE), Tile.STONE, dtype=np.uint8)
+    tiles[1:-1, 1:-1] = Tile.GRASS
+    return tiles
+
+# Paint a square brush along the line between two tiles, so fast drags leave no gaps
+def paint_line(tiles, start, end, size, value):
+    steps = max(abs(end[0] - start[0]), abs(end[1] - start[1])) + 1
+    xs = np.rint(np.linspace(start[0], end[0], steps)).astype(int)
+    ys = np.rint(np.linspace(start[1], end[1], steps)).astype(int)
+    radius = size // 2
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        tiles[max(y - radius, 0):y + radius + 1, max(x - radius, 0):x + radius + 1] = value
+
+def fill_rect(tiles, start, end, value):
+    left, right = sorted((start[0], end[0]))
+    top, bottom = sorted((start[1], end[1]))
+    tiles[top:bottom + 1, left:right + 1] = value
+
+# Fill the 4-connected area of equal tiles around a tile by growing a mask one step at a time
+def flood_fill(tiles, x, y, value):
+    same = tiles == tiles[y, x]
+    area = np.zeros_like(same)
+    area[y, x] = True
+    while True:
+        grown = area.copy()
+        grown[1:] |= area[:-1]
+        grown[:-1] |= area[1:]
+        grown[:, 1:] |= area[:, :-1]
+        grown[:, :-1] |= area[:, 1:]
+        grown &= same
+        if np.array_equal(grown, area):
+            break
+        area = grown
+    tiles[area] = value
+
+# Right click: grass and stone swap, and monsters become bunnies which are then removed
+def cycle_tile(tiles, x, y, monster_mode):
+    current = tiles[y, x]
+    if monster_mode:
+        tiles[y, x] = {Tile.MONSTER: Tile.BUNNY, Tile.BUNNY: Tile.EMPTY}.get(current, Tile.MONSTER)
     else:
-        zoomed_monster_image = pygame.Surface(zoomed_image.get_size(), pygame.SRCALPHA)
-        zoomed_monster_image.fill((0, 0, 0, 0))  # Fill with transparent color
+        tiles[y, x] = Tile.GRASS if current == Tile.STONE else Tile.STONE
 
-    # Increase the window width to accommodate the button
-    window_width = zoomed_image.get_width() + 150
-    zoomed_screen = pygame.display.set_mode((window_width, zoomed_image.get_height()))
+# Open zoomed map window
+def open_zoomed_map(x, y):
+    key = (x, y)
+    map_width = TILE_SIZE * ZOOM_FACTOR
+    zoomed_screen = pygame.display.set_mode((map_width + PANEL_WIDTH, map_width))
     pygame.display.set_caption(f'Zoomed Map {x}-{y}')
+    font = pygame.font.Font(None, 24)
+    clock = pygame.time.Clock()
 
-    # Place the button to the right of the map area
-    mode_button_rect = pygame.Rect(zoomed_image.get_width() + 10, 10, 90, 30)
-    mode_button_color = GREY
-    mode_text_color = GREEN
-    mode_text = 'Map mode'
+    # Buttons to the right of the map area
+    mode_button_rect = pygame.Rect(map_width + 10, 10, 130, 30)
+    tool_rects = [pygame.Rect(map_width + 10, 50 + i * 35, 130, 30) for i in range(len(TOOLS))]
+    swatch_top = 50 + len(TOOLS) * 35 + 40
     monster_mode = False
+    tool = 'brush'
+    brush_size = 1
+    selected = {False: Tile.STONE, True: Tile.MONSTER}
+    stroke = None
+    rect_start = None
+    hover = None
+
+    zoomed_map = zoomed_surface(maps[key], MAP_PALETTE)
+    zoomed_monsters = zoomed_surface(monsters[key], OVERLAY_PALETTE, True) if key in monsters else None
+    redraw = True
 
     running = True
     while running:
+        changed = set()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                zx, zy = event.pos
-                if mode_button_rect.collidepoint(zx, zy):
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_b:
+                    tool = 'brush'
+                elif event.key == pygame.K_r:
+                    tool = 'rectangle'
+                elif event.key == pygame.K_f:
+                    tool = 'fill'
+                elif event.key == pygame.K_m:
                     monster_mode = not monster_mode
-                    mode_text = 'Monster mode' if monster_mode else 'Map mode'
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    brush_size = BRUSH_SIZES[min(BRUSH_SIZES.index(brush_size) + 1, len(BRUSH_SIZES) - 1)]
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    brush_size = BRUSH_SIZES[max(BRUSH_SIZES.index(brush_size) - 1, 0)]
+                elif pygame.K_1 <= event.key <= pygame.K_4:
+                    choices = OVERLAY_TILES if monster_mode else MAP_TILES
+                    if event.key - pygame.K_1 < len(choices):
+                        selected[monster_mode] = choices[event.key - pygame.K_1]
+                redraw = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3):
+                zx, zy = event.pos
+                choices = OVERLAY_TILES if monster_mode else MAP_TILES
+                if zx >= map_width:
+                    if mode_button_rect.collidepoint(zx, zy):
+                        monster_mode = not monster_mode
+                    for name, rect in zip(TOOLS, tool_rects):
+                        if rect.collidepoint(zx, zy):
+                            tool = name
+                    row = (zy - swatch_top) // 35
+                    if zy >= swatch_top and row < len(choices):
+                        selected[monster_mode] = choices[row]
+                    redraw = True
+                    continue
+                if monster_mode and key not in monsters:
+                    monsters[key] = np.zeros_like(maps[key])
+                tiles = monsters[key] if monster_mode else maps[key]
+                tx, ty = zx // ZOOM_FACTOR, zy // ZOOM_FACTOR
+                if event.button == 3:
+                    cycle_tile(tiles, tx, ty, monster_mode)
+                elif tool == 'brush':
+                    paint_line(tiles, (tx, ty), (tx, ty), brush_size, selected[monster_mode])
+                    stroke = (tx, ty)
+                elif tool == 'rectangle':
+                    rect_start = (tx, ty)
+                    hover = (tx, ty)
+                    redraw = True
+                    continue
+                else:
+                    flood_fill(tiles, tx, ty, selected[monster_mode])
+                changed.add('monster' if monster_mode else 'map')
+            elif event.type == pygame.MOUSEMOTION and (stroke or rect_start):
+                tx = min(max(event.pos[0] // ZOOM_FACTOR, 0), TILE_SIZE - 1)
+                ty = min(max(event.pos[1] // ZOOM_FACTOR, 0), TILE_SIZE - 1)
+                if stroke:
+                    tiles = monsters[key] if monster_mode else maps[key]
+                    paint_line(tiles, stroke, (tx, ty), brush_size, selected[monster_mode])
+                    stroke = (tx, ty)
+                    changed.add('monster' if monster_mode else 'map')
                 else:
-                    zx //= ZOOM_FACTOR
-                    zy //= ZOOM_FACTOR
-                    if event.button == 3:  # Right click to change color or place/remove monster/bunny
-                        if monster_mode:
-                            current_color = zoomed_monster_image.get_at((zx * ZOOM_FACTOR, zy * ZOOM_FACTOR))[:3]
-                            if current_color == RED:
-                                # Change monster to bunny
-                                for i in range(ZOOM_FACTOR):
-                                    for j in range(ZOOM_FACTOR):
-                                        zoomed_monster_image.set_at((zx * ZOOM_FACTOR + i, zy * ZOOM_FACTOR + j), YELLOW + (255,))  # Set yellow pixel with full opacity
-                                scaled_down_image = pygame.transform.scale(zoomed_monster_image, (TILE_SIZE, TILE_SIZE))
-                                save_monster(x, y, scaled_down_image)
-                            elif current_color == YELLOW:
-                                # Remove bunny
-                                for i in range(ZOOM_FACTOR):
-                                    for j in range(ZOOM_FACTOR):
-                                        zoomed_monster_image.set_at((zx * ZOOM_FACTOR + i, zy * ZOOM_FACTOR + j), (0, 0, 0, 0))  # Set to transparent
-                                scaled_down_image = pygame.transform.scale(zoomed_monster_image, (TILE_SIZE, TILE_SIZE))
-                                save_monster(x, y, scaled_down_image)
-                            else:
-                                # Place monster
-                                for i in range(ZOOM_FACTOR):
-                                    for j in range(ZOOM_FACTOR):
-                                        zoomed_monster_image.set_at((zx * ZOOM_FACTOR + i, zy * ZOOM_FACTOR + j), RED + (255,))  # Set red pixel with full opacity
-                                scaled_down_image = pygame.transform.scale(zoomed_monster_image, (TILE_SIZE, TILE_SIZE))
-                                save_monster(x, y, scaled_down_image)
-                        else:
-                            current_color = zoomed_image.get_at((zx * ZOOM_FACTOR, zy * ZOOM_FACTOR))[:3]
-                            next_color = GREEN if current_color == GREY else GREY
-                            for i in range(ZOOM_FACTOR):
-                                for j in range(ZOOM_FACTOR):
-                                    zoomed_image.set_at((zx * ZOOM_FACTOR + i, zy * ZOOM_FACTOR + j), next_color)
-                            image.set_at((zx, zy), next_color)
-
-        zoomed_screen.blit(zoomed_image, (0, 0))
-        if monster_mode:
-            zoomed_screen.blit(zoomed_monster_image, (0, 0))
-        pygame.draw.rect(zoomed_screen, mode_button_color, mode_button_rect)
-        font = pygame.font.Font(None, 24)
-        text_surface = font.render(mode_text, True, mode_text_color)
-        zoomed_screen.blit(text_surface, (mode_button_rect.x + 5, mode_button_rect.y + 5))
-        pygame.display.flip()
-
-    save_map(x, y, image)
+                    hover = (tx, ty)
+                    redraw = True
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                if rect_start:
+                    tiles = monsters[key] if monster_mode else maps[key]
+                    fill_rect(tiles, rect_start, hover, selected[monster_mode])
+                    changed.add('monster' if monster_mode else 'map')
+                stroke = None
+                rect_start = None
+
+        # Only the edited layers are scaled again, once for all edits of this frame
+        if 'monster' in changed:
+            zoomed_monsters = zoomed_surface(monsters[key], OVERLAY_PALETTE, True)
+        if 'map' in changed:
+            zoomed_map = zoomed_surface(maps[key], MAP_PALETTE)
+        for layer in changed:
+            mark_dirty(layer, key)
+        redraw = redraw or bool(changed)
+        flush_writes()
+
+        if redraw:
+            zoomed_screen.fill((0, 0, 0))
+            zoomed_screen.blit(zoomed_map, (0, 0))
+            if monster_mode and zoomed_monsters:
+                zoomed_screen.blit(zoomed_monsters, (0, 0))
+            if rect_start:
+                left, right = sorted((rect_start[0], hover[0]))
+                top, bottom = sorted((rect_start[1], hover[1]))
+                outline = pygame.Rect(left * ZOOM_FACTOR, top * ZOOM_FACTOR,
+                                      (right - left + 1) * ZOOM_FACTOR, (bottom - top + 1) * ZOOM_FACTOR)
+                pygame.draw.rect(zoomed_screen, YELLOW, outline, 2)
+
+            pygame.draw.rect(zoomed_screen, GREY, mode_button_rect)
+            zoomed_screen.blit(font.render('Monster mode' if monster_mode else 'Map mode', True, GREEN),
+                               (mode_button_rect.x + 5, mode_button_rect.y + 5))
+            for name, rect in zip(TOOLS, tool_rects):
+                pygame.draw.rect(zoomed_screen, GREY, rect, 0 if name == tool else 1)
+                label = f'{name} {brush_size}' if name == 'brush' else name
+                zoomed_screen.blit(font.render(label, True, GREEN), (rect.x + 5, rect.y + 5))
+            choices = OVERLAY_TILES if monster_mode else MAP_TILES
+            table = OVERLAY_PALETTE if monster_mode else MAP_PALETTE
+            for row, tile in enumerate(choices):
+                swatch = pygame.Rect(map_width + 10, swatch_top + row * 35, 30, 30)
+                pygame.draw.rect(zoomed_screen, table[tile].tolist(), swatch)
+                pygame.draw.rect(zoomed_screen, YELLOW if tile == selected[monster_mode] else GREY, swatch, 2)
+                zoomed_screen.blit(font.render(f'{row + 1} {tile.name.lower()}', True, GREEN),
+                                   (swatch.right + 8, swatch.y + 7))
+            pygame.display.flip()
+            redraw = False
+        clock.tick(FPS)
+
+    flush_writes(force=True)
     pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption('Map Editor')
 
+# Initialize Pygame and open the editor window
+def setup():
+    global screen
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('Map Editor')
+
 # Main loop
 def main():
-    global maps, monsters
-    maps, monsters = load_maps()
+    setup()
+    loaded_maps, loaded_monsters = load_maps()
+    maps.update(loaded_maps)
+    monsters.update(loaded_monsters)
+    overview = Overview(maps)
+    redraw = True
     running = True
 
     while running:
-        screen.fill((0, 0, 0))
-        draw_grid()
-
-        for (x, y), image in maps.items():
-            screen.blit(image, (x * TILE_SIZE, y * TILE_SIZE))
+        if redraw:
+            overview.draw(screen)
+            pygame.display.flip()
+            redraw = False
 
-        for event in pygame.event.get():
+        # Sleep until input arrives, or until the pending writes are due
+        first = pygame.event.wait(SAVE_DELAY) if pending_writes else pygame.event.wait()
+        flush_writes()
+        for event in [first] + pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                x, y = event.pos
-                x //= TILE_SIZE
-                y //= TILE_SIZE
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_w:
+                    flush_writes(force=True)
+                    export_world()
+                elif event.key in PAN_KEYS:
+                    overview.pan(*PAN_KEYS[event.key])
+                    redraw = True
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    steps = -1 if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS) else 1
+                    redraw |= overview.zoom(steps, screen.get_rect().center)
+            elif event.type == pygame.MOUSEWHEEL:
+                redraw |= overview.zoom(event.y, pygame.mouse.get_pos())
+            elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+                overview.pan(-event.rel[0], -event.rel[1])
+                redraw = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                x, y = overview.cell_at(event.pos)
+                # Cell file names have no sign, so the editor stays at non-negative coordinates
+                if x < 0 or y < 0:
+                    continue
                 if (x, y) not in maps:
-                    maps[(x, y)] = create_new_map_image()
-                    save_map(x, y, maps[(x, y)])
-                open_zoomed_map(maps[(x, y)], x, y, monsters.get((x, y)))
-
-        pygame.display.flip()
+                    maps[(x, y)] = create_new_map_tiles()
+                    mark_dirty('map', (x, y))
+                open_zoomed_map(x, y)
+                overview.update_cell((x, y))
+                redraw = True
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                redraw = True
 
+    flush_writes(force=True)
+    export_world()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,266 @@
+import numpy as np
+import pygame
+
+from tiles import SPAWN_DTYPE
+
+# Positions between a previous and a current position, alpha in 0..1
+def interpolate(previous, current, alpha):
+    return np.round(previous + (current - previous) * alpha).astype(np.int32)
+
+# Sprite group that keeps enemy positions, kinds and alive flags in NumPy arrays,
+# so all enemies can be moved in one vectorized step. Sprites are only used for drawing.
+class EnemyGroup(pygame.sprite.RenderUpdates):
+    def __init__(self, *sprites, capacity=64):
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.previous_x = np.zeros(capacity, dtype=np.int32)
+        self.previous_y = np.zeros(capacity, dtype=np.int32)
+        self.width = np.zeros(capacity, dtype=np.int32)
+        self.height = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.uint8)
+        self.alive_mask = np.zeros(capacity, dtype=bool)
+        # Id of the target each enemy walked towards in the last step, -1 before the first
+        self.target = np.full(capacity, -1, dtype=np.int8)
+        self.reassigned = 0
+        self.slot_sprites = [None] * capacity
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        super().__init__(*sprites)
+
+    def grow(self):
+        capacity = len(self.alive_mask)
+        for name in ('x', 'y', 'previous_x', 'previous_y', 'width', 'height', 'kind', 'alive_mask'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+        self.target = np.concatenate((self.target, np.full(capacity, -1, dtype=np.int8)))
+        self.slot_sprites.extend([None] * capacity)
+        self.free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        if not self.free_slots:
+            self.grow()
+        slot = self.free_slots.pop()
+        sprite.slot = slot
+        self.slot_sprites[slot] = sprite
+        self.x[slot], self.y[slot] = sprite.rect.topleft
+        self.previous_x[slot], self.previous_y[slot] = sprite.rect.topleft
+        self.width[slot], self.height[slot] = sprite.rect.size
+        self.kind[slot] = sprite.kind
+        self.target[slot] = -1
+        self.alive_mask[slot] = True
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.alive_mask[sprite.slot] = False
+        self.slot_sprites[sprite.slot] = None
+        self.free_slots.append(sprite.slot)
+
+    # Slots, positions and sizes of all living enemies
+    def bounds(self):
+        slots = np.flatnonzero(self.alive_mask)
+        return slots, self.x[slots], self.y[slots], self.width[slots], self.height[slots]
+
+    # Add sprites in the given slots, e.g. when loading a saved game. The sprites' order becomes
+    # the group's order. free_slots are the remaining slots in the order they are handed out;
+    # the group needs the capacity for all.
+    def add_at(self, slots, sprites, free_slots):
+        for slot, sprite in zip(slots, sprites):
+            self.free_slots = [slot]
+            self.add(sprite)
+        self.free_slots = list(free_slots)
+
+    # Put an enemy at a position without a step in between, e.g. from a network snapshot
+    def place(self, sprite, position):
+        sprite.rect.topleft = position
+        self.x[sprite.slot], self.y[sprite.slot] = position
+        self.previous_x[sprite.slot], self.previous_y[sprite.slot] = position
+
+    # Kinds and positions of the living enemies, or of the given slots, as a spawn table
+    def table(self, slots=None):
+        if slots is None:
+            slots = np.flatnonzero(self.alive_mask)
+        table = np.empty(len(slots), dtype=SPAWN_DTYPE)
+        table['kind'] = self.kind[slots]
+        table['x'] = self.x[slots]
+        table['y'] = self.y[slots]
+        return table
+
+    # Move every enemy one step towards its closest target rect, blocked by the collision map.
+    # With a flow field, enemies walk the shortest path around walls until they share a
+    # tile with a player, and slide along walls instead of stopping. With a target map, the
+    # closest target is looked up by tile instead of measured for every enemy, and reassigned
+    # counts the enemies that changed targets.
+    def step(self, targets, collision, speed, flow=None, target_map=None):
+        self.reassigned = 0
+        slots = np.flatnonzero(self.alive_mask)
+        if not targets or not len(slots):
+            return
+        x = self.x[slots]
+        y = self.y[slots]
+        self.previous_x[slots] = x
+        self.previous_y[slots] = y
+        target_x = np.array([rect.x for rect in targets])
+        target_y = np.array([rect.y for rect in targets])
+
+        if target_map is not None:
+            nearest = target_map.nearest_at(x, y)
+            previous = self.target[slots]
+            assigned = target_map.ids[nearest]
+            self.reassigned = int(np.count_nonzero((previous >= 0) & (previous != assigned)))
+            self.target[slots] = assigned
+        else:
+            # Closest target by squared distance; ties go to the later target
+            distances = (x[:, None] - target_x[None, :]) ** 2 + (y[:, None] - target_y[None, :]) ** 2
+            nearest = len(targets) - 1 - np.argmin(distances[:, ::-1], axis=1)
+        goal_x = target_x[nearest]
+        goal_y = target_y[nearest]
+        if flow is not None:
+            flow_x, flow_y, following = flow.next_positions(x, y)
+            goal_x = np.where(following, flow_x, goal_x)
+            goal_y = np.where(following, flow_y, goal_y)
+        new_x = x + np.sign(goal_x - x) * speed
+        new_y = y + np.sign(goal_y - y) * speed
+
+        width = self.width[slots]
+        height = self.height[slots]
+        blocked = collision.collides_rects(new_x, new_y, width, height)
+        if flow is not None and blocked.any():
+            # Try each axis on its own, so corners do not stop enemies
+            slide_x = blocked & ~collision.collides_rects(new_x, y, width, height)
+            slide_y = blocked & ~slide_x & ~collision.collides_rects(x, new_y, width, height)
+            new_y = np.where(slide_x, y, new_y)
+            new_x = np.where(slide_y, x, new_x)
+            blocked &= ~(slide_x | slide_y)
+        moved = ~blocked & ((new_x != x) | (new_y != y))
+        x = np.where(moved, new_x, x)
+        y = np.where(moved, new_y, y)
+        self.x[slots] = x
+        self.y[slots] = y
+
+        # Copy the new positions to the sprites that moved
+        for slot, new_position in zip(slots[moved].tolist(), zip(x[moved].tolist(), y[moved].tolist())):
+            self.slot_sprites[slot].rect.topleft = new_position
+
+    # Move the sprites to their positions between the last two steps for drawing.
+    # Returns the (sprite, position) pairs needed to put them back afterwards.
+    def interpolate(self, alpha):
+        slots = np.flatnonzero(self.alive_mask & ((self.x != self.previous_x) | (self.y != self.previous_y)))
+        x = interpolate(self.previous_x[slots], self.x[slots], alpha)
+        y = interpolate(self.previous_y[slots], self.y[slots], alpha)
+        restore = []
+        for slot, position in zip(slots.tolist(), zip(x.tolist(), y.tolist())):
+            sprite = self.slot_sprites[slot]
+            restore.append((sprite, sprite.rect.topleft))
+            sprite.rect.topleft = position
+        return restore
+
+
+# Fixed-capacity pool of bullets stored in arrays. Expired bullets give their slot back
+# instead of being reallocated; the pool draws itself with the same clear/draw interface
+# as a RenderUpdates group.
+class BulletPool:
+    def __init__(self, image, capacity=256):
+        self.image = image
+        self.width, self.height = image.get_size()
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.vx = np.zeros(capacity, dtype=np.int32)
+        self.vy = np.zeros(capacity, dtype=np.int32)
+        self.alive_mask = np.zeros(capacity, dtype=bool)
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.used_slots = np.zeros(capacity, dtype=bool)
+        self.drawn_rects = []
+        self.alpha = 1.0
+        self.last_frame = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.spawned = 0
+        self.recycled = 0
+        self.freed = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.alive_mask) - len(self.free_slots)
+
+    @property
+    def capacity(self):
+        return len(self.alive_mask)
+
+    # Claim a slot for a new bullet; the shot is dropped when the pool is full
+    def spawn(self, x, y, vx, vy):
+        if not self.free_slots:
+            self.dropped += 1
+            return None
+        slot = self.free_slots.pop()
+        self.x[slot], self.y[slot] = x, y
+        self.vx[slot], self.vy[slot] = vx, vy
+        self.alive_mask[slot] = True
+        self.spawned += 1
+        if self.used_slots[slot]:
+            self.recycled += 1
+        self.used_slots[slot] = True
+        return slot
+
+    def free(self, slots):
+        for slot in np.atleast_1d(slots).tolist():
+            if self.alive_mask[slot]:
+                self.alive_mask[slot] = False
+                self.free_slots.append(slot)
+                self.freed += 1
+
+    def empty(self):
+        self.free(np.flatnonzero(self.alive_mask))
+
+    # Replace the whole pool state, e.g. with the bullets of a network snapshot
+    def assign(self, alive, x, y, vx, vy):
+        self.alive_mask[:] = alive
+        self.x[:], self.y[:] = x, y
+        self.vx[:], self.vy[:] = vx, vy
+        self.free_slots = np.flatnonzero(~self.alive_mask)[::-1].tolist()
+
+    # Slots, positions and sizes of all living bullets
+    def bounds(self):
+        slots = np.flatnonzero(self.alive_mask)
+        width = np.full(len(slots), self.width, dtype=np.int32)
+        height = np.full(len(slots), self.height, dtype=np.int32)
+        return slots, self.x[slots], self.y[slots], width, height
+
+    def step(self):
+        self.x += np.where(self.alive_mask, self.vx, 0)
+        self.y += np.where(self.alive_mask, self.vy, 0)
+
+    # Store this frame's counters in last_frame and start counting the next frame
+    def end_frame(self):
+        self.last_frame = {
+            'occupancy': len(self),
+            'capacity': self.capacity,
+            'spawned': self.spawned,
+            'recycled': self.recycled,
+            'freed': self.freed,
+            'dropped': self.dropped,
+        }
+        self.reset_counters()
+        return self.last_frame
+
+    def clear(self, surface, background):
+        for rect in self.drawn_rects:
+            surface.blit(background, rect, rect)
+
+    # Draw the next frame between the previous and the current step
+    def interpolate(self, alpha):
+        self.alpha = alpha
+
+    # Blit every living bullet, moved by offset, returns the changed areas like RenderUpdates.draw
+    def draw(self, surface, offset=(0, 0)):
+        slots, x, y, _, _ = self.bounds()
+        if self.alpha < 1:
+            # Bullets fly in straight lines, so the previous position is one velocity back
+            x = interpolate(x - self.vx[slots], x, self.alpha)
+            y = interpolate(y - self.vy[slots], y, self.alpha)
+            self.alpha = 1.0
+        positions = zip((x + offset[0]).tolist(), (y + offset[1]).tolist())
+        new_rects = surface.blits([(self.image, position) for position in positions]) or []
+        dirty = self.drawn_rects + new_rects
+        self.drawn_rects = new_rects
+        return dirty
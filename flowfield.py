@@ -0,0 +1,131 @@
+import numpy as np
+
+# Neighbour offsets (dx, dy) in the order ties are broken
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+UNREACHABLE = -1
+
+# Shift a 2D array by (dx, dy), filling the uncovered border with fill
+def shifted(array, dx, dy, fill):
+    result = np.full_like(array, fill)
+    height, width = array.shape
+    result[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        array[max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+    return result
+
+# Multi-source BFS distance field over the tile grid towards the players, shared by all
+# enemies. It is recomputed only when a player enters another tile or the map changes;
+# following it costs one table lookup per enemy. Sources are tiles of the solid grid,
+# whose top left tile is at the pixel position origin.
+class FlowField:
+    def __init__(self, tile_size):
+        self.tile_size = tile_size
+        self.origin = (0, 0)
+        self.solid = None
+        self.sources = None
+        self.distance = np.zeros((0, 0), dtype=np.int32)
+        self.next_x = np.zeros((0, 0), dtype=np.int32)
+        self.next_y = np.zeros((0, 0), dtype=np.int32)
+        self.recomputes = 0
+
+    # Recompute the field if the source tiles or the solidity map changed
+    def update(self, solid, sources, origin=(0, 0)):
+        sources = tuple(sorted(set(sources)))
+        if solid is self.solid and sources == self.sources:
+            return False
+        self.origin = origin
+        self.solid = solid
+        self.sources = sources
+        self.compute()
+        self.recomputes += 1
+        return True
+
+    def compute(self):
+        walkable = ~self.solid
+        height, width = walkable.shape
+        distance = np.full((height, width), UNREACHABLE, dtype=np.int32)
+        frontier = np.zeros((height, width), dtype=bool)
+        for x, y in self.sources:
+            if 0 <= x < width and 0 <= y < height:
+                frontier[y, x] = True
+        distance[frontier] = 0
+
+        # Grow the frontier one tile per step, like a BFS done for all tiles at once
+        step = 0
+        while frontier.any():
+            step += 1
+            grown = np.zeros_like(frontier)
+            for dx, dy in NEIGHBOURS:
+                grown |= shifted(frontier, dx, dy, False)
+            frontier = grown & walkable & (distance == UNREACHABLE)
+            distance[frontier] = step
+
+        # For every tile, the neighbour one step closer to a player
+        ys, xs = np.indices((height, width), dtype=np.int32)
+        next_x = xs.copy()
+        next_y = ys.copy()
+        found = np.zeros((height, width), dtype=bool)
+        for dx, dy in NEIGHBOURS:
+            neighbour = shifted(distance, -dx, -dy, UNREACHABLE)
+            closer = ~found & (distance > 0) & (neighbour == distance - 1)
+            next_x[closer] += dx
+            next_y[closer] += dy
+            found |= closer
+        self.distance = distance
+        self.next_x = next_x
+        self.next_y = next_y
+
+    # Tile coordinates of the tiles under many pixel positions, clipped to the map
+    def tiles_at(self, xs, ys):
+        height, width = self.distance.shape
+        tile_x = np.clip((xs - self.origin[0]) // self.tile_size, 0, width - 1)
+        tile_y = np.clip((ys - self.origin[1]) // self.tile_size, 0, height - 1)
+        return tile_x, tile_y
+
+    # Pixel position of the next tile to walk to for entities at (xs, ys), with a mask
+    # of the entities that have a path and are not yet in a player's tile
+    def next_positions(self, xs, ys):
+        tile_x, tile_y = self.tiles_at(xs + self.tile_size // 2, ys + self.tile_size // 2)
+        following = self.distance[tile_y, tile_x] > 0
+        goal_x = self.next_x[tile_y, tile_x] * self.tile_size + self.origin[0]
+        goal_y = self.next_y[tile_y, tile_x] * self.tile_size + self.origin[1]
+        return goal_x, goal_y, following
+
+
+# Nearest target for every tile of the grid, a Voronoi partition of the tiles around the
+# target tiles by squared distance; ties go to the later target. Like the flow field it is
+# recomputed only when a target enters another tile or the grid changes, so picking the
+# targets of all enemies is one table lookup.
+class TargetMap:
+    def __init__(self, tile_size):
+        self.tile_size = tile_size
+        self.origin = (0, 0)
+        self.key = None
+        self.ids = np.zeros(0, dtype=np.int8)
+        self.nearest = np.zeros((0, 0), dtype=np.int8)
+        self.recomputes = 0
+
+    # Sources are target tiles of a grid of the given shape; ids name the targets, so
+    # enemies keep their target when another one drops out
+    def update(self, shape, sources, ids, origin=(0, 0)):
+        key = (shape, tuple(sources), tuple(ids), origin)
+        if key == self.key:
+            return False
+        self.key = key
+        self.origin = origin
+        self.ids = np.array(ids, dtype=np.int8)
+        ys, xs = np.indices(shape, dtype=np.int32)
+        if sources:
+            distances = np.stack([(xs - x) ** 2 + (ys - y) ** 2 for x, y in sources])
+            self.nearest = (len(sources) - 1 - np.argmin(distances[::-1], axis=0)).astype(np.int8)
+        else:
+            self.nearest = np.zeros(shape, dtype=np.int8)
+        self.recomputes += 1
+        return True
+
+    # Index into the sources of the nearest target for entities at pixel positions (xs, ys)
+    def nearest_at(self, xs, ys):
+        height, width = self.nearest.shape
+        half = self.tile_size // 2
+        tile_x = np.clip((xs + half - self.origin[0]) // self.tile_size, 0, width - 1)
+        tile_y = np.clip((ys + half - self.origin[1]) // self.tile_size, 0, height - 1)
+        return self.nearest[tile_y, tile_x]
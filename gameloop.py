@@ -0,0 +1,64 @@
+import time
+
+TICK_RATE = 60  # Simulation ticks per second; all speeds are per tick
+MAX_TICKS_PER_FRAME = 5  # Catch-up limit so a slow frame cannot stall the game
+
+# Runs the simulation at a fixed tick rate, independent of how often frames are drawn.
+# tick() advances the simulation by one step. render(alpha) draws a frame, where alpha
+# is how far the real time has progressed towards the next tick (0..1).
+class FixedTimestepLoop:
+    def __init__(self, tick, render=None, tick_rate=TICK_RATE, max_fps=None,
+                 max_ticks_per_frame=MAX_TICKS_PER_FRAME, clock=time.perf_counter):
+        self.tick = tick
+        self.render = render
+        self.tick_time = 1.0 / tick_rate
+        self.frame_time = 1.0 / max_fps if max_fps else 0.0
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.clock = clock
+        self.running = False
+        self.ticks = 0
+        self.frames = 0
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        self.running = True
+        accumulator = 0.0
+        previous = self.clock()
+        while self.running:
+            frame_start = self.clock()
+            accumulator += frame_start - previous
+            previous = frame_start
+
+            # Run as many ticks as the elapsed time asks for, then drop the rest
+            ticks = 0
+            while accumulator >= self.tick_time and ticks < self.max_ticks_per_frame and self.running:
+                self.tick()
+                self.ticks += 1
+                ticks += 1
+                accumulator -= self.tick_time
+            if ticks == self.max_ticks_per_frame:
+                accumulator = min(accumulator, self.tick_time)
+
+            if self.render is not None and self.running:
+                self.render(accumulator / self.tick_time)
+                self.frames += 1
+
+            # Sleep away the rest of the frame instead of spinning
+            remaining = frame_start + max(self.frame_time, 0.001) - self.clock()
+            if remaining > 0:
+                time.sleep(remaining)
+
+    # Run a number of ticks as fast as possible without rendering, returns ticks per second
+    def run_headless(self, ticks):
+        self.running = True
+        start = self.clock()
+        done = 0
+        while done < ticks and self.running:
+            self.tick()
+            self.ticks += 1
+            done += 1
+        elapsed = self.clock() - start
+        self.running = False
+        return done / elapsed if elapsed > 0 else float('inf')
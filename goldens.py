@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import pygame
+
+from render import OffscreenTarget, frame_diff, frame_hash, frame_surface, load_frame
+import byggespillet as game
+from session import PLAYER1_START, PLAYER2_START
+
+GOLDEN_DIRECTORY = 'goldens'
+HASH_FILE = 'frames.json'
+GOLDEN_TICKS = 30  # Ticks played in each cell before its frame is compared
+DIFF_COLOR = (255, 0, 255)
+
+# Start a game in a cell and render it for a number of ticks without input. Returns the
+# time of the first frame, which renders the cell's background, and of each later tick and frame.
+def render_cell(key, ticks):
+    session = game.session
+    session.new_game(key + PLAYER1_START + PLAYER2_START)
+    game.background_cache.invalidate()
+    game.last_background = None
+    no_keys = defaultdict(bool)
+    start = time.perf_counter()
+    game.render_frame()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(ticks):
+        session.tick(no_keys, [])
+        game.render_frame()
+    return first, (time.perf_counter() - start) / max(ticks, 1)
+
+# Save the frame next to the golden image, and a copy with the differing pixels marked
+def save_mismatch(directory, name, frame, differing):
+    pygame.image.save(frame_surface(frame), os.path.join(directory, f'{name}-actual.png'))
+    marked = frame.copy()
+    marked[differing] = DIFF_COLOR
+    pygame.image.save(frame_surface(marked), os.path.join(directory, f'{name}-diff.png'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Render every map cell offscreen and compare the frames with golden images')
+    parser.add_argument('--update', action='store_true', help='write the frames as the new golden images')
+    parser.add_argument('--goldens', default=GOLDEN_DIRECTORY, help='directory of the golden images')
+    parser.add_argument('--ticks', type=int, default=GOLDEN_TICKS, help='ticks played in each cell')
+    parser.add_argument('--dirty', action='store_true', help='draw with dirty rectangles; the goldens are full redraws')
+    args = parser.parse_args()
+
+    target = OffscreenTarget()
+    session = game.setup(target=target)
+    game.DIRTY_RENDERING = args.dirty
+    hash_path = os.path.join(args.goldens, HASH_FILE)
+    goldens = {}
+    if os.path.exists(hash_path):
+        with open(hash_path) as file:
+            goldens = json.load(file)
+
+    hashes = {}
+    failures = 0
+    print(f'{"cell":<8} {"first ms":>9} {"frame ms":>9}  result')
+    for key in sorted(session.map.maps):
+        first, per_frame = render_cell(key, args.ticks)
+        frame = target.rgb(target.latest())
+        name = '-'.join(map(str, key))
+        hashes[name] = frame_hash(frame)
+        golden_path = os.path.join(args.goldens, f'{name}.png')
+        if args.update:
+            os.makedirs(args.goldens, exist_ok=True)
+            pygame.image.save(frame_surface(frame), golden_path)
+            result = 'updated'
+        elif goldens.get(name) == hashes[name]:
+            result = 'ok'
+        elif not os.path.exists(golden_path):
+            result = 'no golden image'
+            failures += 1
+        else:
+            differing = frame_diff(frame, load_frame(golden_path))
+            save_mismatch(args.goldens, name, frame, differing)
+            result = f'{differing.sum()} pixels differ, see {name}-diff.png'
+            failures += 1
+        print(f'{name:<8} {first * 1000:9.2f} {per_frame * 1000:9.2f}  {result}')
+
+    if args.update:
+        with open(hash_path, 'w') as file:
+            json.dump(hashes, file, indent=1, sort_keys=True)
+    pygame.quit()
+    if failures:
+        print(f'{failures} of {len(hashes)} cells do not match {args.goldens}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import socket
+import struct
+from collections import deque
+
+import numpy as np
+
+from replay import MOVE_KEYS, RecordedKeys, key_bits
+from session import ENEMY_TYPES, PLAYER1_CONTROLS, PLAYER2_CONTROLS
+
+# Wire format, little endian. The server greets a client with the index of the player it
+# controls, then sends one snapshot per tick, each prefixed with its length. A client sends
+# one fixed-size input per tick of its own: its tick number and a key mask whose bits 0-3
+# are the held left, right, up and down keys and bit 4 a press of the shoot key.
+# A snapshot is a header followed by the players, bullets and monsters tables. Each table
+# is sent as a delta: its capacity, then the slots of the rows that differ from the last
+# snapshot the client received, then those rows.
+DEFAULT_PORT = 5555
+WELCOME = struct.Struct('<B')
+FRAME = struct.Struct('<I')
+INPUT = struct.Struct('<IB')
+SNAPSHOT_HEADER = struct.Struct('<IIhhI')  # tick, last input tick applied, cell x, cell y, games played
+TABLE_HEADER = struct.Struct('<II')  # capacity, changed rows
+SPECTATOR = 255  # Player index of clients that only watch
+SHOOT_BIT = len(MOVE_KEYS)
+MOVE_MASK = (1 << SHOOT_BIT) - 1
+DIRECTIONS = ('left', 'right', 'up', 'down')
+
+PLAYER_DTYPE = np.dtype([('alive', 'u1'), ('direction', 'u1'), ('x', '<i4'), ('y', '<i4')])
+BULLET_DTYPE = np.dtype([('alive', 'u1'), ('x', '<i4'), ('y', '<i4'), ('vx', 'i1'), ('vy', 'i1')])
+MONSTER_DTYPE = np.dtype([('alive', 'u1'), ('kind', 'u1'), ('x', '<i4'), ('y', '<i4')])
+TABLES = (('players', PLAYER_DTYPE), ('bullets', BULLET_DTYPE), ('monsters', MONSTER_DTYPE))
+
+# Key bits of a client's input, which always uses the first player's keys, and of the
+# server's session, where each player has its own keys
+CLIENT_BITS = key_bits([PLAYER1_CONTROLS])
+SESSION_BITS = key_bits([PLAYER1_CONTROLS, PLAYER2_CONTROLS])
+
+# Key mask of a client's input
+def input_mask(keys, shoot):
+    mask = 0
+    for key, bit in CLIENT_BITS.items():
+        if keys[key]:
+            mask |= 1 << bit
+    return mask | int(shoot) << SHOOT_BIT
+
+# Held keys of the server's session, given each player's input mask
+def session_keys(masks):
+    mask = 0
+    for player, player_mask in enumerate(masks):
+        mask |= (player_mask & MOVE_MASK) << player * len(MOVE_KEYS)
+    return RecordedKeys(SESSION_BITS, mask)
+
+# The game state sent in one tick
+class Snapshot:
+    def __init__(self, tick, cell, games, tables, ack=0, changed=None):
+        self.tick = tick
+        self.ack = ack
+        self.cell = cell
+        self.games = games
+        self.tables = tables
+        # Slots of each table that changed since the previous snapshot, set when decoding
+        self.changed = changed
+
+# Snapshot of a session's state
+def capture(session, tick):
+    players = np.zeros(2, dtype=PLAYER_DTYPE)
+    for row, player in enumerate((session.player1, session.player2)):
+        players[row] = (player.alive(), DIRECTIONS.index(player.direction), player.rect.x, player.rect.y)
+    bullets = np.zeros(session.bullets.capacity, dtype=BULLET_DTYPE)
+    bullets['alive'] = session.bullets.alive_mask
+    bullets['x'] = session.bullets.x
+    bullets['y'] = session.bullets.y
+    bullets['vx'] = session.bullets.vx
+    bullets['vy'] = session.bullets.vy
+    monsters = np.zeros(len(session.monsters.alive_mask), dtype=MONSTER_DTYPE)
+    monsters['alive'] = session.monsters.alive_mask
+    monsters['kind'] = session.monsters.kind
+    monsters['x'] = session.monsters.x
+    monsters['y'] = session.monsters.y
+    game_map = session.map
+    return Snapshot(tick, (game_map.current_x, game_map.current_y), session.games,
+                    {'players': players, 'bullets': bullets, 'monsters': monsters})
+
+# What a table is expected to hold one tick after the baseline. Bullets fly in straight
+# lines, so only new and removed bullets differ from the expectation.
+def expected(name, baseline):
+    table = baseline.copy()
+    if name == 'bullets':
+        alive = table['alive'].astype(bool)
+        table['x'][alive] += table['vx'][alive]
+        table['y'][alive] += table['vy'][alive]
+    return table
+
+# A table grown to a capacity, new rows are empty
+def resized(table, capacity):
+    if len(table) >= capacity:
+        return table
+    grown = np.zeros(capacity, dtype=table.dtype)
+    grown[:len(table)] = table
+    return grown
+
+# Encodes the snapshots of one client as deltas against the last one sent to it.
+# Capacities never shrink, so rows of a smaller table are sent as empty.
+class SnapshotEncoder:
+    def __init__(self):
+        self.baseline = {name: np.zeros(0, dtype=dtype) for name, dtype in TABLES}
+
+    def encode(self, snapshot):
+        parts = [SNAPSHOT_HEADER.pack(snapshot.tick, snapshot.ack, *snapshot.cell, snapshot.games)]
+        for name, _ in TABLES:
+            baseline = expected(name, self.baseline[name])
+            capacity = max(len(snapshot.tables[name]), len(baseline))
+            table = resized(snapshot.tables[name], capacity)
+            changed = np.flatnonzero(table != resized(baseline, capacity))
+            parts.append(TABLE_HEADER.pack(capacity, len(changed)))
+            parts.append(changed.astype('<u4').tobytes())
+            parts.append(table[changed].tobytes())
+            self.baseline[name] = table
+        return b''.join(parts)
+
+# Rebuilds full snapshots from a client's stream of deltas
+class SnapshotDecoder:
+    def __init__(self):
+        self.baseline = {name: np.zeros(0, dtype=dtype) for name, dtype in TABLES}
+
+    def decode(self, data):
+        tick, ack, cell_x, cell_y, games = SNAPSHOT_HEADER.unpack_from(data)
+        offset = SNAPSHOT_HEADER.size
+        tables = {}
+        changed = {}
+        for name, dtype in TABLES:
+            capacity, count = TABLE_HEADER.unpack_from(data, offset)
+            offset += TABLE_HEADER.size
+            slots = np.frombuffer(data, dtype='<u4', count=count, offset=offset)
+            offset += slots.nbytes
+            rows = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += rows.nbytes
+            table = resized(expected(name, self.baseline[name]), capacity)
+            table[slots] = rows
+            tables[name] = table
+            changed[name] = slots
+        self.baseline = tables
+        return Snapshot(tick, (cell_x, cell_y), games, tables, ack, changed)
+
+# A client's connection to the server. Snapshots are read without blocking, so polling
+# fits into the game's own loop.
+class Connection:
+    def __init__(self, host, port=DEFAULT_PORT):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        welcome = b''
+        while len(welcome) < WELCOME.size:
+            data = self.socket.recv(WELCOME.size - len(welcome))
+            if not data:
+                raise ConnectionError('the server closed the connection')
+            welcome += data
+        self.player = WELCOME.unpack(welcome)[0]
+        self.socket.setblocking(False)
+        self.buffer = bytearray()
+        self.decoder = SnapshotDecoder()
+        self.bytes_received = 0
+
+    def send_input(self, tick, mask):
+        self.socket.sendall(INPUT.pack(tick, mask))
+
+    # Snapshots received since the last call, oldest first
+    def poll(self):
+        try:
+            while True:
+                data = self.socket.recv(65536)
+                if not data:
+                    raise ConnectionError('the server closed the connection')
+                self.buffer += data
+                self.bytes_received += len(data)
+        except BlockingIOError:
+            pass
+        snapshots = []
+        while len(self.buffer) >= FRAME.size:
+            length = FRAME.unpack_from(self.buffer)[0]
+            if len(self.buffer) < FRAME.size + length:
+                break
+            snapshots.append(self.decoder.decode(bytes(self.buffer[FRAME.size:FRAME.size + length])))
+            del self.buffer[:FRAME.size + length]
+        return snapshots
+
+    def close(self):
+        self.socket.close()
+
+# Keeps a client's session in step with the server. Nothing is simulated locally except
+# the movement of the client's own player, which is predicted from the inputs the server
+# has not applied yet and corrected by every snapshot.
+class RemoteGame:
+    def __init__(self, session, connection):
+        self.session = session
+        self.connection = connection
+        self.ticks = 0
+        self.enemies = {}  # Sprites by the server's enemy slot
+        self.pending = deque()  # (tick, mask) of the inputs not yet applied by the server
+        players = [session.player1, session.player2]
+        self.own = players[connection.player] if connection.player != SPECTATOR else None
+        if self.own is not None:
+            # The own player is steered with the first player's keys, the other one is remote
+            other = players[1 - connection.player]
+            self.own.controls, other.controls = PLAYER1_CONTROLS, PLAYER2_CONTROLS
+        session.monsters.empty()
+        session.bullets.empty()
+
+    # Send one tick of input, apply the snapshots that arrived and predict the own player
+    def tick(self, keys, shoot):
+        self.ticks += 1
+        mask = input_mask(keys, shoot)
+        self.connection.send_input(self.ticks, mask)
+        for snapshot in self.connection.poll():
+            self.apply(snapshot)
+        if self.own is not None:
+            self.pending.append((self.ticks, mask))
+            if self.own.alive():
+                self.own.move(RecordedKeys(CLIENT_BITS, mask))
+
+    def apply(self, snapshot):
+        session = self.session
+        game_map = session.map
+        if snapshot.cell != (game_map.current_x, game_map.current_y):
+            game_map.move_to(*snapshot.cell)
+
+        tables = snapshot.tables
+        for player, row in zip((session.player1, session.player2), tables['players'].tolist()):
+            alive, direction, x, y = row
+            player.rect.topleft = player.previous_topleft = (x, y)
+            player.direction = DIRECTIONS[direction]
+            if alive and not player.alive():
+                session.player_group.add(player)
+            elif not alive:
+                player.kill()
+
+        bullets = tables['bullets']
+        session.bullets.assign(bullets['alive'].astype(bool), bullets['x'], bullets['y'], bullets['vx'], bullets['vy'])
+
+        changed = snapshot.changed['monsters']
+        for slot, (alive, kind, x, y) in zip(changed.tolist(), tables['monsters'][changed].tolist()):
+            sprite = self.enemies.get(slot)
+            if sprite is not None and (not alive or sprite.kind != kind):
+                sprite.kill()
+                del self.enemies[slot]
+                sprite = None
+            if alive and sprite is None:
+                sprite = self.enemies[slot] = ENEMY_TYPES[kind](session, x, y)
+                session.monsters.add(sprite)
+            elif alive:
+                session.monsters.place(sprite, (x, y))
+
+        # Replay the inputs the server has not applied yet on top of its position
+        while self.pending and self.pending[0][0] <= snapshot.ack:
+            self.pending.popleft()
+        if self.own is not None and self.own.alive():
+            for _, mask in self.pending:
+                self.own.move(RecordedKeys(CLIENT_BITS, mask))
@@ -0,0 +1,131 @@
+import csv
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+HISTORY = 600  # Samples kept per timer for the rolling percentiles
+NULL_SCOPE = nullcontext()
+
+# Times one named section of the frame, reused for every call of that section
+class Scope:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.add_sample(self.name, time.perf_counter() - self.start)
+
+# Scoped timers with rolling p50/p95/p99 histories and per-frame entity counts.
+# While disabled, scope() hands out a shared no-op context and nothing is recorded.
+class Profiler:
+    def __init__(self, timers, counters=(), history=HISTORY):
+        self.timers = list(timers)
+        self.counters = list(counters)
+        self.enabled = False
+        self.history = {name: deque(maxlen=history) for name in self.timers}
+        self.scopes = {name: Scope(self, name) for name in self.timers}
+        self.frame_times = {name: 0.0 for name in self.timers}
+        self.totals = {name: 0.0 for name in self.timers}
+        self.counts = {name: 0 for name in self.counters}
+        self.frame = 0
+        self.export_file = None
+        self.export_writer = None
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return self.scopes[name]
+
+    def add_sample(self, name, seconds):
+        self.history[name].append(seconds)
+        self.frame_times[name] += seconds
+        self.totals[name] += seconds
+
+    # Forget all samples and totals
+    def reset(self):
+        for name in self.timers:
+            self.history[name].clear()
+            self.frame_times[name] = 0.0
+            self.totals[name] = 0.0
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = value
+
+    # p50, p95 and p99 of a timer in milliseconds
+    def percentiles(self, name):
+        samples = self.history[name]
+        if not samples:
+            return 0.0, 0.0, 0.0
+        return tuple(np.percentile(np.fromiter(samples, dtype=float), (50, 95, 99)) * 1000)
+
+    def summary(self):
+        return {name: self.percentiles(name) for name in self.timers}
+
+    # Write one row per frame to a .csv or .jsonl file
+    def export_to(self, path):
+        self.enabled = True
+        self.export_file = open(path, 'w', newline='')
+        if path.endswith('.csv'):
+            self.export_writer = csv.writer(self.export_file)
+            self.export_writer.writerow(['frame'] + [f'{name}_ms' for name in self.timers] + self.counters)
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        if self.export_file is not None:
+            times = [round(self.frame_times[name] * 1000, 4) for name in self.timers]
+            if self.export_writer is not None:
+                self.export_writer.writerow([self.frame] + times + [self.counts[name] for name in self.counters])
+            else:
+                row = {'frame': self.frame, **{f'{name}_ms': value for name, value in zip(self.timers, times)}, **self.counts}
+                self.export_file.write(json.dumps(row) + '\n')
+        self.frame += 1
+        for name in self.timers:
+            self.frame_times[name] = 0.0
+
+    def close(self):
+        if self.export_file is not None:
+            self.export_file.close()
+            self.export_file = None
+            self.export_writer = None
+
+# Work time of the frames in which a marked event happened, such as a map transition.
+# A frame runs from the first start() to end(), so sleeping between frames is not counted.
+class EventFrameTimer:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.frame_start = None
+        self.marked = False
+        self.events = 0
+        self.last = 0.0
+        self.worst = 0.0
+        self.total = 0.0
+
+    def start(self):
+        if self.frame_start is None:
+            self.frame_start = self.clock()
+
+    def mark(self):
+        self.marked = True
+
+    def end(self):
+        if self.marked and self.frame_start is not None:
+            self.last = self.clock() - self.frame_start
+            self.worst = max(self.worst, self.last)
+            self.total += self.last
+            self.events += 1
+        self.frame_start = None
+        self.marked = False
+
+    # Worst, mean and last event frame in milliseconds
+    def stats(self):
+        mean = self.total / self.events if self.events else 0.0
+        return {'events': self.events, 'worst_ms': self.worst * 1000, 'mean_ms': mean * 1000, 'last_ms': self.last * 1000}
@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+import numpy as np
+import pygame
+
+FRAME_RING_SIZE = 8  # Frames an offscreen target keeps
+
+# Where the game's frames go: a window, or memory for tests and benchmarks. open() returns
+# the surface to draw on, present() shows what was drawn, optionally only the given rects.
+class DisplayTarget:
+    def open(self, size, caption):
+        surface = pygame.display.set_mode(size)
+        pygame.display.set_caption(caption)
+        return surface
+
+    def present(self, rects=None):
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+
+# Renders without a window under the SDL dummy driver. Every presented frame is copied
+# into the next buffer of a ring allocated once at open(), as the display's raw pixels, so
+# capturing is one memory copy and allocates nothing per frame.
+class OffscreenTarget:
+    def __init__(self, ring_size=FRAME_RING_SIZE):
+        self.ring_size = ring_size
+        self.surface = None
+        self.frames = None
+        self.count = 0
+
+    def open(self, size, caption):
+        if not pygame.display.get_init() or pygame.display.get_driver() != 'dummy':
+            # The driver is picked when the display starts, so restart it with the dummy one
+            pygame.display.quit()
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.display.init()
+        self.surface = pygame.display.set_mode(size)
+        # Rows first, the layout of the surface's memory
+        self.frames = np.zeros((self.ring_size, size[1], size[0]), dtype=np.uint32)
+        self.count = 0
+        return self.surface
+
+    # Dirty rects are ignored, the whole surface is captured
+    def present(self, rects=None):
+        np.copyto(self.frames[self.count % self.ring_size], pygame.surfarray.pixels2d(self.surface).T)
+        self.count += 1
+
+    # The most recently presented frame, a view into the ring that the next frames overwrite
+    def latest(self):
+        return self.frames[(self.count - 1) % self.ring_size]
+
+    # Raw pixels of a captured frame as an RGB array indexed [y, x]
+    def rgb(self, pixels):
+        shifts = self.surface.get_shifts()
+        rgb = np.empty(pixels.shape + (3,), dtype=np.uint8)
+        for channel in range(3):
+            rgb[..., channel] = pixels >> shifts[channel]
+        return rgb
+
+
+def frame_hash(rgb):
+    return hashlib.blake2b(np.ascontiguousarray(rgb), digest_size=16).hexdigest()
+
+# Mask of the pixels that differ between two RGB frames
+def frame_diff(rgb, other):
+    return (rgb != other).any(axis=2)
+
+# An RGB frame as a surface, e.g. to save it as an image
+def frame_surface(rgb):
+    return pygame.surfarray.make_surface(rgb.transpose(1, 0, 2))
+
+def load_frame(path):
+    return pygame.surfarray.array3d(pygame.image.load(path)).transpose(1, 0, 2)
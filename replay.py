@@ -0,0 +1,72 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Input log layout: a header with the start state and tick count, followed by one
+# zlib-compressed uint16 per tick. Bits 0-7 are the held movement keys (left, right,
+# up, down of player 1, then player 2), bits 8-9 the shoot key presses of each player.
+MAGIC = b'BYGI'
+VERSION = 1
+HEADER = struct.Struct('<4sHhhhhhhI')
+MOVE_KEYS = ('left', 'right', 'up', 'down')
+SHOOT_BIT = 8
+
+# Bit of every movement key in a tick's mask, player by player
+def key_bits(controls):
+    return {keys[name]: player * len(MOVE_KEYS) + i
+            for player, keys in enumerate(controls) for i, name in enumerate(MOVE_KEYS)}
+
+# Pressed keys of one recorded tick, indexable like pygame.key.get_pressed()
+class RecordedKeys:
+    def __init__(self, bits, mask):
+        self.bits = bits
+        self.mask = mask
+
+    def __getitem__(self, key):
+        bit = self.bits.get(key)
+        return bit is not None and bool(self.mask >> bit & 1)
+
+# Per-tick key states and shoot events of a play session.
+# start is (cell x, cell y, player 1 x, player 1 y, player 2 x, player 2 y).
+class InputLog:
+    def __init__(self, controls, start, masks=()):
+        self.controls = controls
+        self.start = tuple(start)
+        self.masks = list(masks)
+        self.bits = key_bits(controls)
+
+    def __len__(self):
+        return len(self.masks)
+
+    # Add one tick; shooters are the indices of the players that fired
+    def record(self, keys, shooters):
+        mask = 0
+        for key, bit in self.bits.items():
+            if keys[key]:
+                mask |= 1 << bit
+        for player in shooters:
+            mask |= 1 << (SHOOT_BIT + player)
+        self.masks.append(mask)
+
+    # Keys and shooting players of a recorded tick
+    def tick(self, index):
+        mask = self.masks[index]
+        shooters = [player for player in range(len(self.controls)) if mask >> (SHOOT_BIT + player) & 1]
+        return RecordedKeys(self.bits, mask), shooters
+
+    def save(self, path):
+        data = zlib.compress(np.array(self.masks, dtype='<u2').tobytes())
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, *self.start, len(self.masks)))
+            file.write(data)
+
+    @classmethod
+    def load(cls, path, controls):
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+            magic, version, *start, ticks = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a version {VERSION} input log')
+            masks = np.frombuffer(zlib.decompress(file.read()), dtype='<u2', count=ticks)
+        return cls(controls, start, masks.tolist())
@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+
+from assets import headless_assets
+from replay import InputLog
+from session import PLAYER1_CONTROLS, PLAYER1_START, PLAYER2_CONTROLS, PLAYER2_START, Session
+from world import Map
+from worldfile import WORLD_FILE
+
+CONTROLS = [PLAYER1_CONTROLS, PLAYER2_CONTROLS]
+START_CELL = (6, 9)
+SCRIPT_STEP = 30  # Ticks each scripted player keeps walking in one direction
+MOVES = ((), ('left',), ('right',), ('up',), ('down',), ('up', 'right'), ('down', 'left'))
+
+# Input log of two players walking and shooting at random, the same for the same seed
+def scripted_log(seed, ticks):
+    rng = random.Random(seed)
+    log = InputLog(CONTROLS, START_CELL + PLAYER1_START + PLAYER2_START)
+    held = [(), ()]
+    for tick in range(ticks):
+        if tick % SCRIPT_STEP == 0:
+            held = [rng.choice(MOVES), rng.choice(MOVES)]
+        keys = defaultdict(bool)
+        for controls, names in zip(CONTROLS, held):
+            for name in names:
+                keys[controls[name]] = True
+        log.record(keys, [player for player in (0, 1) if rng.random() < 0.05])
+    return log
+
+# Play one headless session in a worker process. A finished game starts over from the
+# log's start state; a log shorter than the run is played again from its beginning.
+def run_session(job):
+    seed, ticks, replay_file, packed, scrolling = job
+    log = InputLog.load(replay_file, CONTROLS) if replay_file else scripted_log(seed, ticks)
+    game_map = Map(*log.start[:2], world_file=WORLD_FILE if packed else None, scrolling=scrolling)
+    session = Session(game_map, headless_assets(), log.start)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        keys, shooters = log.tick(tick % len(log))
+        players = (session.player1, session.player2)
+        session.tick(keys, [players[index] for index in shooters])
+        if session.over:
+            session.new_game(log.start)
+    seconds = time.perf_counter() - start
+    return {'ticks': ticks, 'seconds': seconds, 'games': session.games}
+
+def main():
+    parser = argparse.ArgumentParser(description='Run many headless game sessions in parallel')
+    parser.add_argument('sessions', type=int, nargs='?', default=os.cpu_count(), help='number of sessions')
+    parser.add_argument('--ticks', type=int, default=3600, help='ticks simulated per session')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--replay', help='play this input log in every session instead of scripted input')
+    parser.add_argument('--packed', action='store_true', help='read the world from the packed world file')
+    parser.add_argument('--scroll', action='store_true', help='simulate the scrolling world')
+    args = parser.parse_args()
+
+    jobs = [(seed, args.ticks, args.replay, args.packed, args.scroll) for seed in range(args.sessions)]
+    start = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.map(run_session, jobs)
+    elapsed = time.perf_counter() - start
+
+    ticks = sum(result['ticks'] for result in results)
+    session_rate = sum(result['ticks'] / result['seconds'] for result in results) / len(results)
+    print(f'{len(results)} sessions on {args.workers} workers: {ticks} ticks in {elapsed:.2f} s')
+    print(f'aggregate {ticks / elapsed:.0f} ticks/s, {session_rate:.0f} ticks/s per session, '
+          f'{sum(result["games"] for result in results)} games played')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import struct
+
+import numpy as np
+
+from entities import BulletPool, EnemyGroup
+from session import ENEMY_TYPES
+from tiles import SPAWN_DTYPE
+
+# Saved game layout, little endian: a header, then these arrays back to back
+#   players         two rows: alive, direction, x, y
+#   bullets         slots (uint32) and rows (x, y, vx, vy) of the bullets in flight,
+#                   then the free slots in the order they are handed out
+#   monsters        slots (uint32) and spawn table rows (kind, x, y) in the group's order,
+#                   then the free slots
+#   cell states     one (x, y, rows) entry per saved cell, then all their spawn table rows
+# Slots, free slot orders and the enemy group's order, which decides the order its slots are
+# freed in when it is emptied, are kept, so a loaded game continues exactly like the saved one.
+MAGIC = b'BYGS'
+VERSION = 3
+HEADER = struct.Struct('<4sHIIhhIIIIIIII')
+DIRECTIONS = ('left', 'right', 'up', 'down')  # Player directions by their saved number
+PLAYER_DTYPE = np.dtype([('alive', 'u1'), ('direction', 'u1'), ('x', '<i4'), ('y', '<i4')])
+BULLET_DTYPE = np.dtype([('x', '<i4'), ('y', '<i4'), ('vx', 'i1'), ('vy', 'i1')])
+ENEMY_DTYPE = SPAWN_DTYPE.newbyteorder('<')
+CELL_DTYPE = np.dtype([('x', '<i4'), ('y', '<i4'), ('rows', '<u4')])
+SAVE_FILE = 'quicksave.bygs'
+
+# The session's state as bytes; the arrays are joined without intermediate copies
+def save(session):
+    game_map = session.map
+    players = np.zeros(2, dtype=PLAYER_DTYPE)
+    for row, player in enumerate((session.player1, session.player2)):
+        players[row] = (player.alive(), DIRECTIONS.index(player.direction), player.rect.x, player.rect.y)
+
+    pool = session.bullets
+    bullet_slots = np.flatnonzero(pool.alive_mask).astype('<u4')
+    bullets = np.empty(len(bullet_slots), dtype=BULLET_DTYPE)
+    for name in BULLET_DTYPE.names:
+        bullets[name] = getattr(pool, name)[bullet_slots]
+    bullet_free = np.array(pool.free_slots, dtype='<u4')
+
+    group = session.monsters
+    enemy_slots = np.array([sprite.slot for sprite in group.sprites()], dtype='<u4')
+    enemies = group.table(enemy_slots).astype(ENEMY_DTYPE)
+    enemy_free = np.array(group.free_slots, dtype='<u4')
+
+    cells = np.array([(x, y, len(table)) for (x, y), table in game_map.cell_states.items()], dtype=CELL_DTYPE)
+    cell_rows = [table.astype(ENEMY_DTYPE, copy=False) for table in game_map.cell_states.values()]
+
+    header = HEADER.pack(MAGIC, VERSION, session.ticks, session.games, game_map.current_x, game_map.current_y,
+                         pool.capacity, len(bullet_slots), len(bullet_free),
+                         len(group.alive_mask), len(enemy_slots), len(enemy_free), len(cells), int(cells['rows'].sum()))
+    return b''.join([header, players, bullet_slots, bullets, bullet_free, enemy_slots, enemies, enemy_free, cells, *cell_rows])
+
+# Arrays read in order from a saved game, as views into its bytes
+class Reader:
+    def __init__(self, data, offset):
+        self.data = data
+        self.offset = offset
+
+    def read(self, dtype, count):
+        array = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += array.nbytes
+        return array
+
+# Replace the session's game with a saved one. Nothing is restarted recursively: the map
+# enters the saved cell and the players, bullets and enemies are rebuilt in place.
+def load(session, data):
+    (magic, version, ticks, games, cell_x, cell_y, bullet_capacity, bullet_count, bullet_free_count,
+     enemy_capacity, enemy_count, enemy_free_count, cell_count, cell_row_count) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a version {VERSION} saved game')
+    reader = Reader(data, HEADER.size)
+    players = reader.read(PLAYER_DTYPE, 2)
+    bullet_slots = reader.read('<u4', bullet_count)
+    bullets = reader.read(BULLET_DTYPE, bullet_count)
+    bullet_free = reader.read('<u4', bullet_free_count)
+    enemy_slots = reader.read('<u4', enemy_count)
+    enemies = reader.read(ENEMY_DTYPE, enemy_count)
+    enemy_free = reader.read('<u4', enemy_free_count)
+    cells = reader.read(CELL_DTYPE, cell_count)
+    cell_rows = reader.read(ENEMY_DTYPE, cell_row_count)
+
+    game_map = session.map
+    ends = np.cumsum(cells['rows']).tolist()
+    game_map.cell_states = {(x, y): cell_rows[end - rows:end].astype(SPAWN_DTYPE)
+                            for (x, y, rows), end in zip(cells.tolist(), ends)}
+    if (cell_x, cell_y) != (game_map.current_x, game_map.current_y):
+        game_map.move_to(cell_x, cell_y)
+
+    for player, (alive, direction, x, y) in zip((session.player1, session.player2), players.tolist()):
+        player.rect.topleft = player.previous_topleft = (x, y)
+        player.direction = DIRECTIONS[direction]
+        if alive:
+            session.player_group.add(player)
+        else:
+            player.kill()
+
+    session.bullets = BulletPool(session.images.get('bullet'), bullet_capacity)
+    pool = session.bullets
+    for name in BULLET_DTYPE.names:
+        getattr(pool, name)[bullet_slots] = bullets[name]
+    pool.alive_mask[bullet_slots] = True
+    pool.used_slots[bullet_slots] = True
+    pool.free_slots = bullet_free.tolist()
+
+    session.monsters = EnemyGroup(capacity=enemy_capacity)
+    sprites = [ENEMY_TYPES[kind](session, x, y) for kind, x, y in enemies.tolist()]
+    session.monsters.add_at(enemy_slots.tolist(), sprites, enemy_free.tolist())
+
+    session.ticks = ticks
+    session.games = games
+    session.over = False
+
+def save_file(session, path=SAVE_FILE):
+    with open(path, 'wb') as file:
+        file.write(save(session))
+
+def load_file(session, path=SAVE_FILE):
+    with open(path, 'rb') as file:
+        load(session, file.read())
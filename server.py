@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import socket
+import time
+
+from assets import headless_assets
+from gameloop import TICK_RATE
+from network import (DEFAULT_PORT, FRAME, INPUT, SHOOT_BIT, SPECTATOR, WELCOME, SnapshotEncoder, capture,
+                     session_keys)
+from session import Session
+from world import Map
+from worldfile import WORLD_FILE
+
+MAX_BACKLOG = 64 * 1024  # Unsent bytes after which a slow client skips snapshots
+STATS_INTERVAL = 600  # Ticks between the statistics printed by the command line server
+
+# One connection: the player it controls, its latest input and its snapshot encoder
+class Client:
+    def __init__(self, writer, player):
+        self.writer = writer
+        self.player = player
+        self.mask = 0
+        self.shoot = False
+        self.ack = 0
+        self.encoder = SnapshotEncoder()
+
+# Authoritative server: runs one session at the fixed tick rate and sends every client a
+# delta snapshot per tick. The first two clients control the players, later ones watch.
+# A client that cannot keep up skips snapshots; its deltas stay correct because they are
+# taken against the last snapshot it was sent.
+class GameServer:
+    def __init__(self, session, tick_rate=TICK_RATE):
+        self.session = session
+        self.tick_time = 1.0 / tick_rate
+        self.clients = []
+        self.ticks = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats_ticks = 0
+        self.tick_seconds = 0.0
+        self.worst_tick = 0.0
+        self.snapshots = 0
+        self.skipped = 0
+        self.bytes_sent = 0
+
+    async def handle_client(self, reader, writer):
+        taken = {client.player for client in self.clients}
+        player = next((index for index in (0, 1) if index not in taken), SPECTATOR)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer.write(WELCOME.pack(player))
+        client = Client(writer, player)
+        self.clients.append(client)
+        try:
+            while True:
+                tick, mask = INPUT.unpack(await reader.readexactly(INPUT.size))
+                client.mask = mask
+                # Presses are kept until a tick applies them, held keys only as the latest state
+                client.shoot |= bool(mask >> SHOOT_BIT & 1)
+                client.ack = tick
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.remove(client)
+            writer.close()
+
+    # Simulate one tick with the clients' latest inputs and send the snapshot
+    def step(self):
+        session = self.session
+        players = (session.player1, session.player2)
+        masks = [0, 0]
+        shooters = []
+        for client in self.clients:
+            if client.player != SPECTATOR:
+                masks[client.player] = client.mask
+                if client.shoot:
+                    shooters.append(players[client.player])
+                    client.shoot = False
+        session.tick(session_keys(masks), shooters)
+        if session.over:
+            session.new_game()
+
+        snapshot = capture(session, self.ticks)
+        for client in self.clients:
+            if client.writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                self.skipped += 1
+                continue
+            snapshot.ack = client.ack
+            data = client.encoder.encode(snapshot)
+            client.writer.write(FRAME.pack(len(data)) + data)
+            self.snapshots += 1
+            self.bytes_sent += FRAME.size + len(data)
+
+    # Tick until stopped or for a number of ticks, sleeping away the rest of every tick
+    async def run(self, ticks=None, report=None):
+        next_tick = time.perf_counter()
+        while ticks is None or self.ticks < ticks:
+            start = time.perf_counter()
+            self.step()
+            elapsed = time.perf_counter() - start
+            self.tick_seconds += elapsed
+            self.worst_tick = max(self.worst_tick, elapsed)
+            self.stats_ticks += 1
+            self.ticks += 1
+            if report is not None and self.ticks % STATS_INTERVAL == 0:
+                report(self.stats())
+                self.reset_stats()
+            next_tick += self.tick_time
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    # Work time per tick and bytes sent per snapshot since the last reset
+    def stats(self):
+        ticks = max(self.stats_ticks, 1)
+        return {
+            'clients': len(self.clients),
+            'mean_tick_ms': self.tick_seconds * 1000 / ticks,
+            'worst_tick_ms': self.worst_tick * 1000,
+            'bytes_per_tick': self.bytes_sent / ticks,
+            'bytes_per_snapshot': self.bytes_sent / max(self.snapshots, 1),
+            'skipped': self.skipped,
+        }
+
+    def close(self):
+        for client in self.clients:
+            client.writer.close()
+
+def print_stats(stats):
+    print(f"{stats['clients']} clients  tick {stats['mean_tick_ms']:.3f} ms (worst {stats['worst_tick_ms']:.3f})  "
+          f"{stats['bytes_per_tick']:.0f} bytes/tick  {stats['bytes_per_snapshot']:.0f} bytes/snapshot  "
+          f"{stats['skipped']} skipped")
+
+async def serve(host, port, packed, scrolling):
+    game_map = Map(6, 9, world_file=WORLD_FILE if packed else None, scrolling=scrolling)
+    server = GameServer(Session(game_map, headless_assets()))
+    listener = await asyncio.start_server(server.handle_client, host, port)
+    print(f'Serving on {host}:{port}')
+    async with listener:
+        await server.run(report=print_stats)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the authoritative game server')
+    parser.add_argument('--host', default='localhost', help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--packed', action='store_true', help='read the world from the packed world file')
+    parser.add_argument('--scroll', action='store_true', help='run the scrolling world')
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.packed, args.scroll))
+
+if __name__ == '__main__':
+    main()
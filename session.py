@@ -0,0 +1,318 @@
+import numpy as np
+import pygame
+
+from entities import BulletPool, EnemyGroup
+from flowfield import FlowField, TargetMap
+from profiler import Profiler
+from spatial import SpatialHash, rect_arrays
+from tiles import Tile
+from world import DIRECTION_VECTORS, SCREEN_HEIGHT, SCREEN_WIDTH, TILE_SIZE
+
+# Speeds are in pixels per simulation tick, see gameloop.TICK_RATE
+PLAYER_SPEED = TILE_SIZE // 10  # Adjusted speed
+BULLET_SPEED = 5
+MONSTER_SPEED = TILE_SIZE // 20  # Adjusted speed for monsters
+BULLET_CAPACITY = 256  # Maximum number of bullets in flight
+SIMULATION_TIMERS = ('players', 'bullets', 'monsters', 'collision')  # Profiler scopes used by a tick
+
+# Player controls and start positions
+PLAYER1_CONTROLS = {'left': pygame.K_LEFT, 'right': pygame.K_RIGHT, 'up': pygame.K_UP, 'down': pygame.K_DOWN, 'shoot': pygame.K_RCTRL}
+PLAYER2_CONTROLS = {'left': pygame.K_a, 'right': pygame.K_d, 'up': pygame.K_w, 'down': pygame.K_s, 'shoot': pygame.K_g}
+PLAYER1_START = (2*50, 3*50)
+PLAYER2_START = (2*50, 2*50)
+# Where players are put in the next cell after crossing an edge: the side of their rect and its position
+ENTRY_POSITIONS = {'right': ('left', 32), 'left': ('right', SCREEN_WIDTH - 32),
+                   'down': ('top', 32), 'up': ('bottom', SCREEN_HEIGHT - 32)}
+
+class Player(pygame.sprite.Sprite):
+    def __init__(self, session, x, y, controls, image):
+        super().__init__()
+        self.session = session
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.rect.topleft = (x, y)
+        self.direction = 'down'
+        self.controls = controls
+        self.previous_topleft = self.rect.topleft
+
+    def update(self, keys):
+        self.move(keys)
+        session = self.session
+        if session.map.scrolling:
+            # The camera follows the players, there are no screen edges
+            return
+
+        # Check if player exits the map and load the adjacent map
+        if self.rect.right > SCREEN_WIDTH - 30:
+            direction = 'right'
+        elif self.rect.left < 30:
+            direction = 'left'
+        elif self.rect.bottom > SCREEN_HEIGHT - 30:
+            direction = 'down'
+        elif self.rect.top < 30:
+            direction = 'up'
+        else:
+            return
+        if not session.move_to_adjacent_map(direction):
+            # There is no cell on that side, stay at the edge
+            self.rect.topleft = self.previous_topleft
+            return
+        side, position = ENTRY_POSITIONS[direction]
+        setattr(self.rect, side, position)
+        session.player1.rect.topleft = self.rect.topleft
+        session.player2.rect.topleft = self.rect.topleft
+
+    # Walk one tick in the direction of the held keys unless stone is in the way
+    def move(self, keys):
+        self.previous_topleft = self.rect.topleft
+        new_x, new_y = self.rect.topleft
+        if keys[self.controls['left']]:
+            new_x -= PLAYER_SPEED
+            self.direction = 'left'
+        if keys[self.controls['right']]:
+            new_x += PLAYER_SPEED
+            self.direction = 'right'
+        if keys[self.controls['up']]:
+            new_y -= PLAYER_SPEED
+            self.direction = 'up'
+        if keys[self.controls['down']]:
+            new_y += PLAYER_SPEED
+            self.direction = 'down'
+
+        # Check for collision with stone tiles
+        if not self.collides_with_stone(new_x, new_y):
+            self.rect.topleft = (new_x, new_y)
+
+    def collides_with_stone(self, x, y):
+        return self.session.map.collision.collides_rect(x, y, self.rect.width, self.rect.height)
+
+    def shoot(self):
+        if self.direction == 'left':
+            x, y = self.rect.left, self.rect.centery - 2
+        elif self.direction == 'right':
+            x, y = self.rect.right, self.rect.centery - 2
+        elif self.direction == 'up':
+            x, y = self.rect.centerx - 5, self.rect.top
+        elif self.direction == 'down':
+            x, y = self.rect.centerx - 5, self.rect.bottom
+        dx, dy = DIRECTION_VECTORS[self.direction]
+        self.session.bullets.spawn(x, y, dx * BULLET_SPEED, dy * BULLET_SPEED)
+
+# Shared setup of monsters and bunnies; their session's EnemyGroup moves them
+class Enemy(pygame.sprite.Sprite):
+    def __init__(self, session, x, y, image):
+        super().__init__()
+        self.session = session
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.rect.topleft = (x, y)
+
+
+class Bunny(Enemy):
+    kind = Tile.BUNNY
+
+    def __init__(self, session, x, y):
+        super().__init__(session, x, y, session.images.get('bunny'))
+
+
+# Monster class
+class Monster(Enemy):
+    kind = Tile.MONSTER
+
+    def __init__(self, session, x, y):
+        super().__init__(session, x, y, session.images.get('monster'))
+
+
+# Enemy class spawned for each overlay kind
+ENEMY_TYPES = {Tile.MONSTER: Monster, Tile.BUNNY: Bunny}
+
+
+# One game on a map: the players, enemies and bullets, advanced one tick at a time.
+# A session does not draw and needs no display, so many can run side by side. images
+# only give the sprites their looks and sizes, e.g. an AssetManager. When both players
+# are dead, over is set and the owner decides whether to start a new game.
+class Session:
+    def __init__(self, game_map, images, start=None, profiler=None):
+        self.map = game_map
+        self.images = images
+        self.profiler = profiler if profiler is not None else Profiler(SIMULATION_TIMERS)
+        # Shortest paths towards the players, recomputed when a player enters another tile
+        self.flow_field = FlowField(TILE_SIZE)
+        # Closest player for every tile, recomputed at the same time
+        self.target_map = TargetMap(TILE_SIZE)
+        # Broad phase for collisions against monsters, rebuilt after the monsters move
+        self.monster_hash = SpatialHash(TILE_SIZE)
+        self.monster_hash_slots = np.zeros(0, dtype=np.int64)
+        self.ticks = 0
+        self.games = 0
+        self.new_game(start)
+
+    # Create the players, bullets and monsters for a new game. start is the
+    # (cell x, cell y, player 1 x, player 1 y, player 2 x, player 2 y) state of an input log.
+    def new_game(self, start=None):
+        game_map = self.map
+        if start is not None:
+            cell_x, cell_y, *positions = start
+            game_map.current_x, game_map.current_y = cell_x, cell_y
+            game_map.enter_current_cell()
+        else:
+            positions = PLAYER1_START + PLAYER2_START
+        origin_x, origin_y = game_map.cell_origin(game_map.current_x, game_map.current_y)
+
+        # Create player instances
+        self.player1 = Player(self, origin_x + positions[0], origin_y + positions[1], PLAYER1_CONTROLS, self.images.get('player'))
+        self.player2 = Player(self, origin_x + positions[2], origin_y + positions[3], PLAYER2_CONTROLS, self.images.get('player2'))
+        self.player_group = pygame.sprite.RenderUpdates(self.player1, self.player2)
+        self.bullets = BulletPool(self.images.get('bullet'), BULLET_CAPACITY)
+
+        # Create monsters
+        self.monsters = EnemyGroup()
+        self.over = False
+        self.games += 1
+
+        game_map.cell_states.clear()
+        self.spawn_window()
+        if game_map.prepare:
+            game_map.prepare_neighbours()
+
+    # The start state of the current game, as stored in input logs. Player positions are
+    # relative to the current cell.
+    def start_state(self):
+        game_map = self.map
+        origin_x, origin_y = game_map.cell_origin(game_map.current_x, game_map.current_y)
+        positions = (self.player1.rect.x - origin_x, self.player1.rect.y - origin_y,
+                     self.player2.rect.x - origin_x, self.player2.rect.y - origin_y)
+        return (game_map.current_x, game_map.current_y) + positions
+
+    # Advance the game by one tick; shooters are the players whose shoot key was pressed
+    def tick(self, keys, shooters):
+        self.map.transition_timer.start()
+        for player in shooters:
+            player.shoot()
+
+        # Update player positions
+        with self.profiler.scope('players'):
+            self.player1.update(keys)
+            self.player2.update(keys)
+            if self.map.scrolling:
+                self.focus_on(*self.players_center())
+
+        # Update bullets
+        with self.profiler.scope('bullets'):
+            self.update_bullets()
+
+        # Update monsters
+        with self.profiler.scope('monsters'):
+            self.update_monsters()
+
+        # Check for bullet collisions with monsters
+        with self.profiler.scope('collision'):
+            self.handle_bullet_hits()
+        self.bullets.end_frame()
+        self.ticks += 1
+
+    # Midpoint of the living players, or of both players if none is alive
+    def players_center(self):
+        players = [player for player in (self.player1, self.player2) if player.alive()] or [self.player1, self.player2]
+        return (sum(player.rect.centerx for player in players) // len(players),
+                sum(player.rect.centery for player in players) // len(players))
+
+    # Move all enemies in one vectorized step and kill the players they touch
+    def update_monsters(self):
+        collision = self.map.collision
+        ids = [index for index, player in enumerate((self.player1, self.player2)) if player.alive()]
+        players = [(self.player1, self.player2)[index] for index in ids]
+        origin_x, origin_y = collision.origin
+        player_tiles = [((player.rect.centerx - origin_x) // TILE_SIZE, (player.rect.centery - origin_y) // TILE_SIZE)
+                        for player in players]
+        self.flow_field.update(collision.solid, player_tiles, collision.origin)
+        self.target_map.update(collision.solid.shape, player_tiles, ids, collision.origin)
+        self.monsters.step([player.rect for player in players], collision, MONSTER_SPEED, self.flow_field,
+                           self.target_map)
+        self.monster_hash_slots, *monster_bounds = self.monsters.bounds()
+        self.monster_hash.rebuild(*monster_bounds)
+        touched, _ = self.monster_hash.query_pairs(*rect_arrays([player.rect for player in players]))
+        for index in set(touched.tolist()):
+            players[index].kill()
+
+        # Check if both players are dead
+        if not self.player1.alive() and not self.player2.alive():
+            self.over = True
+
+    # Free bullets together with the first monster each of them hits
+    def handle_bullet_hits(self):
+        bullets = self.bullets
+        if not len(bullets) or not len(self.monster_hash):
+            return
+        bullet_slots, *bullet_bounds = bullets.bounds()
+        hit_bullets, hit_monsters = self.monster_hash.query_pairs(*bullet_bounds)
+        for bullet_index, monster_index in zip(hit_bullets.tolist(), hit_monsters.tolist()):
+            slot = bullet_slots[bullet_index]
+            monster = self.monsters.slot_sprites[self.monster_hash_slots[monster_index]]
+            if bullets.alive_mask[slot] and monster is not None:
+                bullets.free(slot)
+                monster.kill()
+
+    # Move all bullets and free those that hit stone in one map lookup
+    def update_bullets(self):
+        self.bullets.step()
+        slots, x, y, width, height = self.bullets.bounds()
+        hits = self.map.collision.solid_at(x + width // 2, y + height // 2)
+        self.bullets.free(slots[hits])
+
+    # Enter the neighbouring cell in a direction; returns False, changing nothing, when
+    # the world has no cell there
+    def move_to_adjacent_map(self, direction):
+        game_map = self.map
+        dx, dy = DIRECTION_VECTORS[direction]
+        if game_map.get_cell(game_map.current_x + dx, game_map.current_y + dy)[0] is None:
+            return False
+
+        # Clear current monsters
+        if game_map.keep_state:
+            game_map.save_cell_state((game_map.current_x, game_map.current_y), self.monsters.table())
+        self.monsters.empty()
+
+        # Move to the new map and spawn its monsters
+        prepared = game_map.move_to(game_map.current_x + dx, game_map.current_y + dy)
+        self.spawn_from(game_map.cell_spawns((game_map.current_x, game_map.current_y), prepared))
+        return True
+
+    # When scrolling, make the cell under a world position the current one. The window
+    # moves along: enemies of the cells that leave it are removed, those of the cells
+    # that enter it are spawned.
+    def focus_on(self, x, y):
+        game_map = self.map
+        key = (x // SCREEN_WIDTH, y // SCREEN_HEIGHT)
+        if key == (game_map.current_x, game_map.current_y):
+            return
+        old_window = game_map.window()
+        game_map.move_to(*key)
+        window = game_map.window()
+        self.despawn_cells([cell for cell in old_window if cell not in window])
+        for cell in window:
+            if cell not in old_window:
+                self.spawn_from(game_map.cell_spawns(cell), game_map.cell_origin(*cell))
+
+    # Create the enemies of a spawn table in one batch; items have no entity yet
+    def spawn_from(self, table, origin=(0, 0)):
+        origin_x, origin_y = origin
+        self.monsters.add(*[ENEMY_TYPES[kind](self, x + origin_x, y + origin_y)
+                            for kind, x, y in table.tolist() if kind in ENEMY_TYPES])
+
+    # Spawn the enemies of every cell in the window
+    def spawn_window(self):
+        for key in self.map.window():
+            self.spawn_from(self.map.cell_spawns(key), self.map.cell_origin(*key))
+
+    # Remove the enemies standing in the given cells, saving them if cells keep their state
+    def despawn_cells(self, keys):
+        slots, x, y, width, height = self.monsters.bounds()
+        cell_x = (x + width // 2) // SCREEN_WIDTH
+        cell_y = (y + height // 2) // SCREEN_HEIGHT
+        for key in keys:
+            inside = slots[(cell_x == key[0]) & (cell_y == key[1])]
+            if self.map.keep_state:
+                self.map.save_cell_state(key, self.monsters.table(inside))
+            for slot in inside.tolist():
+                self.monsters.slot_sprites[slot].kill()
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Uniform grid spatial hash over axis-aligned rectangles given as x, y, width, height arrays.
+# The items are rebuilt into a sorted cell table once per frame, then many rectangles can be
+# queried in bulk; only items sharing a grid cell are tested against each other.
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.rebuild([], [], [], [])
+
+    # Grid cells covered by each rectangle, as (cell keys, rectangle index)
+    def covered_cells(self, x, y, width, height):
+        left = x // self.cell_size
+        top = y // self.cell_size
+        right = (x + np.maximum(width, 1) - 1) // self.cell_size
+        bottom = (y + np.maximum(height, 1) - 1) // self.cell_size
+        span_x = int((right - left).max(initial=0)) + 1
+        span_y = int((bottom - top).max(initial=0)) + 1
+        keys = []
+        owners = []
+        index = np.arange(len(x))
+        for dy in range(span_y):
+            for dx in range(span_x):
+                inside = (left + dx <= right) & (top + dy <= bottom)
+                # Pack the two cell coordinates into one int64 key
+                keys.append(((top[inside] + dy) << 32) + (left[inside] + dx))
+                owners.append(index[inside])
+        return np.concatenate(keys), np.concatenate(owners)
+
+    def rebuild(self, x, y, width, height):
+        self.x = np.asarray(x, dtype=np.int64)
+        self.y = np.asarray(y, dtype=np.int64)
+        self.width = np.asarray(width, dtype=np.int64)
+        self.height = np.asarray(height, dtype=np.int64)
+        keys, owners = self.covered_cells(self.x, self.y, self.width, self.height)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.owners = owners[order]
+
+    def __len__(self):
+        return len(self.x)
+
+    # All (query index, item index) pairs whose rectangles overlap, sorted by query index
+    def query_pairs(self, x, y, width, height):
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        width = np.asarray(width, dtype=np.int64)
+        height = np.asarray(height, dtype=np.int64)
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(x) or not len(self.keys):
+            return empty, empty
+
+        # Broad phase: join the query cells with the item cells
+        keys, queries = self.covered_cells(x, y, width, height)
+        start = np.searchsorted(self.keys, keys, side='left')
+        counts = np.searchsorted(self.keys, keys, side='right') - start
+        queries = np.repeat(queries, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        items = self.owners[np.repeat(start, counts) + offsets]
+
+        # A pair sharing several cells is only tested once
+        pairs = np.unique(queries * len(self) + items)
+        queries = pairs // len(self)
+        items = pairs % len(self)
+
+        # Narrow phase: exact rectangle overlap, same rule as Rect.colliderect
+        overlap = ((x[queries] < self.x[items] + self.width[items])
+                   & (x[queries] + width[queries] > self.x[items])
+                   & (y[queries] < self.y[items] + self.height[items])
+                   & (y[queries] + height[queries] > self.y[items]))
+        return queries[overlap], items[overlap]
+
+# x, y, width and height arrays of a list of pygame Rects
+def rect_arrays(rects):
+    if not rects:
+        return (np.zeros(0, dtype=np.int64),) * 4
+    return tuple(np.array([tuple(rect) for rect in rects], dtype=np.int64).T)
@@ -0,0 +1,76 @@
+import os
+from enum import IntEnum
+
+import numpy as np
+from PIL import Image
+
+# Tile ids stored in the map and overlay arrays, one byte per tile
+class Tile(IntEnum):
+    EMPTY = 0
+    GRASS = 1
+    STONE = 2
+    MONSTER = 3
+    BUNNY = 4
+    ITEM = 5
+
+# Overlay tiles that become entities when a cell is entered
+SPAWN_KINDS = (Tile.MONSTER, Tile.BUNNY, Tile.ITEM)
+
+# One row of a spawn table: what to spawn and where, in pixels
+SPAWN_DTYPE = np.dtype([('kind', np.uint8), ('x', np.int32), ('y', np.int32)])
+
+# A cell's map and monster overlay PNGs are named like 6-9-map.png and 6-9-monster.png
+MAP_SUFFIX = '-map.png'
+OVERLAY_SUFFIX = '-monster.png'
+
+# Pixel colors used by the map and overlay PNGs
+MAP_COLORS = {
+    Tile.STONE: (128, 128, 128),  # Grey color for stone tiles
+    Tile.GRASS: (0, 255, 0),  # Green color for grass tiles
+}
+OVERLAY_COLORS = {
+    Tile.MONSTER: (255, 0, 0),  # Red color for monsters
+    Tile.BUNNY: (255, 255, 0),  # Yellow color for bunnies
+    Tile.ITEM: (0, 0, 255),  # Blue color for items
+}
+
+# Match every pixel of an RGB array against a color table at once
+def decode_pixels(rgb, colors, default):
+    rgb = rgb.astype(np.uint32)
+    packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    tiles = np.full(packed.shape, default, dtype=np.uint8)
+    for tile, (r, g, b) in colors.items():
+        tiles[packed == (r << 16) | (g << 8) | b] = tile
+    return tiles
+
+# (cell, suffix, path) of every map and overlay PNG in a maps directory
+def cell_files(directory):
+    for filename in os.listdir(directory):
+        for suffix in (MAP_SUFFIX, OVERLAY_SUFFIX):
+            if filename.endswith(suffix):
+                parts = filename[:-len(suffix)].split('-')
+                if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+                    yield (int(parts[0]), int(parts[1])), suffix, os.path.join(directory, filename)
+
+def read_rgb(file_path):
+    with Image.open(file_path) as image:
+        return np.asarray(image.convert('RGB'))
+
+def decode_map(file_path):
+    # Unrecognized colors default to grass
+    return decode_pixels(read_rgb(file_path), MAP_COLORS, Tile.GRASS)
+
+def decode_overlay(file_path):
+    return decode_pixels(read_rgb(file_path), OVERLAY_COLORS, Tile.EMPTY)
+
+# Compile the overlays of a cell into a spawn table, in overlay and row-major order
+def compile_spawns(overlays, tile_size):
+    tables = []
+    for overlay in overlays:
+        ys, xs = np.nonzero(np.isin(overlay, SPAWN_KINDS))
+        table = np.empty(len(xs), dtype=SPAWN_DTYPE)
+        table['kind'] = overlay[ys, xs]
+        table['x'] = xs * tile_size
+        table['y'] = ys * tile_size
+        tables.append(table)
+    return np.concatenate(tables) if tables else np.empty(0, dtype=SPAWN_DTYPE)
@@ -0,0 +1,322 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from collision import CollisionMap
+from profiler import EventFrameTimer
+from tiles import MAP_SUFFIX, OVERLAY_SUFFIX, Tile, cell_files, compile_spawns, decode_map, decode_overlay
+from worldfile import WorldFile
+
+# A map cell fills the screen in room mode; when scrolling, cells sit side by side
+SCREEN_WIDTH = 1024
+SCREEN_HEIGHT = 1024
+TILE_SIZE = 32
+CELL_SHAPE = (SCREEN_HEIGHT // TILE_SIZE, SCREEN_WIDTH // TILE_SIZE)  # Tiles per map cell, rows and columns
+MAP_CACHE_SIZE = 64  # Number of decoded map cells kept in memory in lazy mode
+DIRECTION_VECTORS = {'left': (-1, 0), 'right': (1, 0), 'up': (0, -1), 'down': (0, 1)}
+
+# Size-bounded LRU of decoded map cells, filled on demand and by background prefetching
+class CellCache:
+    def __init__(self, load_cell, max_size=MAP_CACHE_SIZE):
+        self.load_cell = load_cell
+        self.max_size = max_size
+        self.cells = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetches = 0
+
+    def get(self, key):
+        with self.lock:
+            cell = self.cells.get(key)
+            if cell is not None:
+                self.cells.move_to_end(key)
+                self.hits += 1
+                return cell
+            future = self.pending.get(key)
+        if future is not None:
+            # Already being decoded in the background, wait for it
+            cell = future.result()
+            with self.lock:
+                self.hits += 1
+            return cell
+        with self.lock:
+            self.misses += 1
+        cell = self.load_cell(*key)
+        with self.lock:
+            self.store(key, cell)
+        return cell
+
+    def prefetch(self, key):
+        with self.lock:
+            if key not in self.cells and key not in self.pending:
+                self.pending[key] = self.executor.submit(self.load_in_background, key)
+
+    def load_in_background(self, key):
+        cell = self.load_cell(*key)
+        with self.lock:
+            self.pending.pop(key, None)
+            self.store(key, cell)
+            self.prefetches += 1
+        return cell
+
+    # Must be called with the lock held
+    def store(self, key, cell):
+        self.cells[key] = cell
+        self.cells.move_to_end(key)
+        while len(self.cells) > self.max_size:
+            self.cells.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'prefetches': self.prefetches,
+                'size': len(self.cells),
+            }
+
+# A cell made ready to be entered: its grid, collision bitmap, spawn table and, given a
+# render function, its pre-rendered background
+class PreparedCell:
+    def __init__(self, key, tiles, spawns, render=None):
+        self.key = key
+        self.tiles = tiles
+        self.spawns = spawns
+        self.collision = CollisionMap(TILE_SIZE).load(tiles)
+        self.background = render(tiles) if render is not None and tiles is not None else None
+
+# The world's map cells. In room mode the current cell fills the screen; when scrolling,
+# the current cell is the one under the players and positions are in world pixels,
+# with the cells around it stitched into one collision map and populated with enemies.
+# backgrounds is the cache that prepared cell backgrounds go to; without one, as in
+# headless sessions, no backgrounds are rendered.
+class Map:
+    def __init__(self, start_x, start_y, directory='maps', lazy=False, world_file=None, prepare=False,
+                 keep_state=False, scrolling=False, backgrounds=None):
+        self.current_x = start_x
+        self.current_y = start_y
+        self.scrolling = scrolling
+        self.directory = directory
+        self.lazy = lazy and world_file is None
+        self.world = None
+        self.maps = {}
+        self.overlays = {}
+        self.spawn_tables = {}
+        # The preparation thread reads cells too; cells and spawn tables are filled under this lock
+        self.cells_lock = threading.Lock()
+        # Surviving enemies of the cells left behind, as spawn tables
+        self.keep_state = keep_state
+        self.cell_states = {}
+        self.collision = CollisionMap(TILE_SIZE)
+        self.backgrounds = backgrounds
+        # Worst-case frame time of the frames in which the current cell changed
+        self.transition_timer = EventFrameTimer()
+        self.prepare = prepare
+        self.prepared = {}
+        self.prepared_hits = 0
+        self.prepared_waits = 0
+        self.preparer = ThreadPoolExecutor(max_workers=1) if prepare else None
+        if world_file is not None:
+            # Cells are views into the memory-mapped file, nothing is decoded
+            self.world = WorldFile(world_file)
+        elif self.lazy:
+            # Cells are decoded on first access, nothing is read at startup
+            self.cell_cache = CellCache(self.load_cell)
+            self.prefetch_neighbours()
+        else:
+            self.load_all_maps()
+            self.load_all_overlays()
+        self.enter_current_cell()
+
+    def load_all_maps(self):
+        for key, suffix, path in cell_files(self.directory):
+            if suffix == MAP_SUFFIX:
+                self.maps[key] = self.load_map_from_png(path)
+
+    def load_map_from_png(self, file_path):
+        # uint8 array of Tile ids indexed as [y, x]
+        return decode_map(file_path)
+
+    def load_all_overlays(self):
+        for key, suffix, path in cell_files(self.directory):
+            if suffix == OVERLAY_SUFFIX:
+                self.overlays.setdefault(key, []).append(self.load_overlay_from_png(path))
+        for key, overlays in self.overlays.items():
+            self.spawn_tables[key] = compile_spawns(overlays, TILE_SIZE)
+
+    def load_overlay_from_png(self, file_path):
+        # uint8 array of Tile ids, Tile.EMPTY where there is no overlay
+        return decode_overlay(file_path)
+
+    # Decode a single cell for the lazy cache, with its spawn table, so both are evicted together
+    def load_cell(self, x, y):
+        map_path = os.path.join(self.directory, f'{x}-{y}{MAP_SUFFIX}')
+        monster_path = os.path.join(self.directory, f'{x}-{y}{OVERLAY_SUFFIX}')
+        tiles = self.load_map_from_png(map_path) if os.path.exists(map_path) else None
+        overlays = [self.load_overlay_from_png(monster_path)] if os.path.exists(monster_path) else []
+        return tiles, overlays, compile_spawns(overlays, TILE_SIZE)
+
+    # Tiles and overlays of a cell; lazily loaded cells also carry their spawn table
+    def get_cell(self, x, y):
+        if self.lazy:
+            return self.cell_cache.get((x, y))
+        if self.world is not None and (x, y) not in self.maps:
+            with self.cells_lock:
+                # Keep the first views so every access returns the same arrays. The map goes
+                # in last, as it tells other threads that the cell is complete.
+                if (x, y) not in self.maps:
+                    tiles, overlays = self.world.cell(x, y)
+                    self.overlays[(x, y)] = overlays
+                    self.spawn_tables.setdefault((x, y), compile_spawns(overlays, TILE_SIZE))
+                    self.maps[(x, y)] = tiles
+        return self.maps.get((x, y)), self.overlays.get((x, y), [])
+
+    # Cells around the current one within distance, in rows
+    def cells_around(self, distance):
+        return [(self.current_x + dx, self.current_y + dy)
+                for dy in range(-distance, distance + 1) for dx in range(-distance, distance + 1)]
+
+    # Cells that have enemies and collide, the current one and, when scrolling, the ones around it
+    def window(self):
+        return self.cells_around(1) if self.scrolling else [(self.current_x, self.current_y)]
+
+    # Cells that may become part of the window on the next move
+    def neighbours(self):
+        if self.scrolling:
+            window = set(self.window())
+            return [key for key in self.cells_around(2) if key not in window]
+        return [(self.current_x + dx, self.current_y + dy) for dx, dy in DIRECTION_VECTORS.values()]
+
+    # World pixel position of a cell's top left corner; room mode has no world positions
+    def cell_origin(self, x, y):
+        if self.scrolling:
+            return x * SCREEN_WIDTH, y * SCREEN_HEIGHT
+        return 0, 0
+
+    def prefetch_neighbours(self):
+        for key in self.neighbours():
+            self.cell_cache.prefetch(key)
+
+    def cache_stats(self):
+        return self.cell_cache.stats() if self.lazy else None
+
+    def get_current_map(self):
+        return self.get_cell(self.current_x, self.current_y)[0]
+
+    # Tile grids of the window joined into one, missing cells are stone
+    def stitched_tiles(self):
+        stone = np.full(CELL_SHAPE, Tile.STONE, dtype=np.uint8)
+        rows = []
+        for dy in (-1, 0, 1):
+            row = [self.get_cell(self.current_x + dx, self.current_y + dy)[0] for dx in (-1, 0, 1)]
+            rows.append([stone if tiles is None else tiles for tiles in row])
+        return np.block(rows)
+
+    # Precompute per-cell data when a cell is entered, or take it from a prepared cell
+    def enter_current_cell(self, prepared=None):
+        if self.scrolling:
+            self.collision.load(self.stitched_tiles(), self.cell_origin(self.current_x - 1, self.current_y - 1))
+        elif prepared is None:
+            self.collision.load(self.get_current_map())
+        else:
+            self.collision = prepared.collision
+            if prepared.background is not None:
+                self.backgrounds.store(prepared.key, prepared.tiles, prepared.background)
+
+    # Start preparing the cells that can be entered or scrolled into view next on the
+    # background thread, skipping those with a cached background. Must only be called once
+    # the display exists, backgrounds are converted to its format.
+    def prepare_neighbours(self):
+        if self.scrolling:
+            candidates = [key for key in self.window() if key != (self.current_x, self.current_y)]
+        else:
+            candidates = self.neighbours()
+        keys = [key for key in candidates if self.backgrounds is None or key not in self.backgrounds.surfaces]
+        for key in list(self.prepared):
+            if key not in keys:
+                self.prepared.pop(key).cancel()
+        for key in keys:
+            if key not in self.prepared:
+                self.prepared[key] = self.preparer.submit(self.prepare_cell, key)
+
+    # Keep the backgrounds of the prepared cells that are finished
+    def collect_prepared(self):
+        for key, future in list(self.prepared.items()):
+            if future.done():
+                del self.prepared[key]
+                prepared = future.result()
+                self.prepared_hits += 1
+                if prepared.background is not None:
+                    self.backgrounds.store(key, prepared.tiles, prepared.background)
+
+    def prepare_cell(self, key):
+        render = self.backgrounds.render if self.backgrounds is not None else None
+        return PreparedCell(key, self.get_cell(*key)[0], self.spawn_table(*key), render)
+
+    # The prepared cell for key, waiting for it if it is not finished yet
+    def take_prepared(self, key):
+        future = self.prepared.pop(key, None)
+        if future is None:
+            return None
+        if future.done():
+            self.prepared_hits += 1
+        else:
+            self.prepared_waits += 1
+        return future.result()
+
+    def preparation_stats(self):
+        return {'hits': self.prepared_hits, 'waits': self.prepared_waits, 'pending': len(self.prepared)}
+
+    def get_current_overlays(self):
+        return self.get_cell(self.current_x, self.current_y)[1]
+
+    # Make another cell the current one, returns its prepared cell if there is one
+    def move_to(self, x, y):
+        self.transition_timer.mark()
+        self.current_x, self.current_y = x, y
+        prepared = self.take_prepared((x, y)) if self.prepare and not self.scrolling else None
+        self.enter_current_cell(prepared)
+        if self.lazy:
+            self.prefetch_neighbours()
+        if self.prepare:
+            if self.scrolling:
+                self.collect_prepared()
+            self.prepare_neighbours()
+        return prepared
+
+    # Spawn table of a cell, from the lazy cache or compiled from its overlays if loading did
+    # not do it already
+    def spawn_table(self, x, y):
+        if self.lazy:
+            return self.cell_cache.get((x, y))[2]
+        table = self.spawn_tables.get((x, y))
+        if table is None:
+            table = compile_spawns(self.get_cell(x, y)[1], TILE_SIZE)
+            # Keep the table of another thread that got here first
+            with self.cells_lock:
+                table = self.spawn_tables.setdefault((x, y), table)
+        return table
+
+    # The saved enemies of a revisited cell, otherwise its spawn table
+    def cell_spawns(self, key, prepared=None):
+        if key in self.cell_states:
+            return self.cell_states[key]
+        return prepared.spawns if prepared is not None else self.spawn_table(*key)
+
+    # Remember the surviving enemies of a cell, given as a spawn table in world positions;
+    # items are kept from its spawn table
+    def save_cell_state(self, key, enemies):
+        origin_x, origin_y = self.cell_origin(*key)
+        enemies['x'] -= origin_x
+        enemies['y'] -= origin_y
+        table = self.spawn_table(*key)
+        self.cell_states[key] = np.concatenate((enemies, table[table['kind'] == Tile.ITEM]))
@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+from session import ENTRY_POSITIONS, PLAYER1_START
+from tiles import MAP_SUFFIX, SPAWN_KINDS, Tile, cell_files, decode_map, decode_overlay
+from world import CELL_SHAPE, DIRECTION_VECTORS, TILE_SIZE
+from worldfile import WORLD_FILE, write_world
+
+# Compiled cells are cached by the hash of their PNG files and this version, so a rebuild
+# only decodes the cells that changed. Bump it when compile_cell changes.
+COMPILER_VERSION = b'1'
+CACHE_FILE = '.worldcache.npz'
+START_CELL = (6, 9)
+START_TILE = (PLAYER1_START[0] // TILE_SIZE, PLAYER1_START[1] // TILE_SIZE)
+
+# The row or column of a cell's tiles at a depth from each side, 0 being the outermost
+SIDES = {
+    'left': lambda tiles, depth: tiles[:, depth],
+    'right': lambda tiles, depth: tiles[:, -1 - depth],
+    'up': lambda tiles, depth: tiles[depth],
+    'down': lambda tiles, depth: tiles[-1 - depth],
+}
+OPPOSITE = {'left': 'right', 'right': 'left', 'up': 'down', 'down': 'up'}
+# Players are put this many tiles inside the cell they enter, see session.ENTRY_POSITIONS
+LANDING_DEPTH = ENTRY_POSITIONS['right'][1] // TILE_SIZE
+
+# Map and monster PNG paths of every cell in a maps directory, None where a layer is missing
+def scan_directory(directory):
+    sources = {}
+    for key, suffix, path in cell_files(directory):
+        sources.setdefault(key, [None, None])[0 if suffix == MAP_SUFFIX else 1] = path
+    return sources
+
+def content_hash(paths):
+    digest = hashlib.blake2b(COMPILER_VERSION, digest_size=16)
+    for path in paths:
+        if path is None:
+            digest.update(b'-')
+            continue
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+# Label the 4-connected regions of walkable tiles: every tile of a region gets the smallest
+# tile index in it, stone gets -1. Each step takes the smallest label of the neighbours and
+# then the label of the tile a label points to, so long corridors take few steps.
+def label_regions(walkable):
+    height, width = walkable.shape
+    unlabelled = height * width
+    labels = np.where(walkable, np.arange(unlabelled).reshape(height, width), unlabelled)
+    while True:
+        spread = labels.copy()
+        np.minimum(spread[1:], labels[:-1], out=spread[1:])
+        np.minimum(spread[:-1], labels[1:], out=spread[:-1])
+        np.minimum(spread[:, 1:], labels[:, :-1], out=spread[:, 1:])
+        np.minimum(spread[:, :-1], labels[:, 1:], out=spread[:, :-1])
+        spread[~walkable] = unlabelled
+        flat = np.append(spread.ravel(), unlabelled)
+        spread = flat[flat[:-1]].reshape(height, width)
+        if np.array_equal(spread, labels):
+            break
+        labels = spread
+    labels[~walkable] = -1
+    return labels.astype(np.int16)
+
+# Decode one cell and label its regions, in a worker process
+def compile_cell(job):
+    key, map_path, monster_path = job
+    tiles = decode_map(map_path) if map_path else None
+    overlay = decode_overlay(monster_path) if monster_path else None
+    regions = label_regions(tiles != Tile.STONE) if tiles is not None else None
+    return key, (tiles, overlay, regions)
+
+# Compiled cells by content hash from an earlier build, stored as stacked arrays
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as cache:
+        if cache['tiles'].shape[1:] != CELL_SHAPE:
+            return {}
+        hashes, has_tiles, has_overlay = cache['hashes'].tolist(), cache['has_tiles'], cache['has_overlay']
+        tiles, overlays, regions = cache['tiles'], cache['overlays'], cache['regions']
+    return {content: (tiles[i] if has_tiles[i] else None, overlays[i] if has_overlay[i] else None,
+                      regions[i] if has_tiles[i] else None)
+            for i, content in enumerate(hashes)}
+
+def save_cache(path, compiled):
+    count = len(compiled)
+    tiles = np.zeros((count,) + CELL_SHAPE, dtype=np.uint8)
+    overlays = np.zeros((count,) + CELL_SHAPE, dtype=np.uint8)
+    regions = np.full((count,) + CELL_SHAPE, -1, dtype=np.int16)
+    has_tiles = np.zeros(count, dtype=bool)
+    has_overlay = np.zeros(count, dtype=bool)
+    for i, (cell_tiles, overlay, cell_regions) in enumerate(compiled.values()):
+        if cell_tiles is not None:
+            tiles[i], regions[i], has_tiles[i] = cell_tiles, cell_regions, True
+        if overlay is not None:
+            overlays[i], has_overlay[i] = overlay, True
+    # Write to a temporary file first, like the world file, so a broken build keeps the old cache
+    temp_path = path + '.tmp.npz'
+    np.savez(temp_path, hashes=np.array(list(compiled), dtype='U32'), has_tiles=has_tiles,
+             has_overlay=has_overlay, tiles=tiles, overlays=overlays, regions=regions)
+    os.replace(temp_path, path)
+
+# Regions reachable from a start region, given the regions each region leads to
+def reachable_regions(edges, start):
+    reached = {start}
+    queue = deque([start])
+    while queue:
+        for region in edges.get(queue.popleft(), ()):
+            if region not in reached:
+                reached.add(region)
+                queue.append(region)
+    return reached
+
+# Check a compiled world; returns (errors, warnings) as lists of (cell, message).
+# A player crosses a side of a cell standing on its two outer rows or columns, and is put
+# LANDING_DEPTH tiles inside the neighbour, in the same rows or columns. A crossing can work
+# in one direction only, so what is reachable from the start follows the crossings as
+# links between the regions of the cells.
+def check_world(cells, start_cell=START_CELL, start_tile=START_TILE):
+    errors = []
+    warnings = []
+    valid = {}
+    for key, (tiles, overlay, regions) in cells.items():
+        if tiles is None:
+            errors.append((key, 'has a monster overlay but no map'))
+        elif tiles.shape != CELL_SHAPE:
+            errors.append((key, f'is {tiles.shape[1]}x{tiles.shape[0]} tiles, the game needs '
+                                f'{CELL_SHAPE[1]}x{CELL_SHAPE[0]}'))
+        elif overlay is not None and overlay.shape != tiles.shape:
+            errors.append((key, f'has a {overlay.shape[1]}x{overlay.shape[0]} monster overlay for a '
+                                f'{tiles.shape[1]}x{tiles.shape[0]} map'))
+        else:
+            valid[key] = (tiles, overlay, regions)
+
+    edges = {}
+    for (x, y), (tiles, _, regions) in valid.items():
+        walkable = tiles != Tile.STONE
+        for direction, (dx, dy) in DIRECTION_VECTORS.items():
+            exits = SIDES[direction](walkable, 0) & SIDES[direction](walkable, 1)
+            if not exits.any():
+                continue
+            neighbour = valid.get((x + dx, y + dy))
+            if neighbour is None:
+                if (x + dx, y + dy) not in cells:
+                    errors.append(((x, y), f'is open to the {direction}, but cell {x + dx},{y + dy} does not exist'))
+                continue
+            landing = SIDES[OPPOSITE[direction]](neighbour[0] != Tile.STONE, LANDING_DEPTH)
+            # A player is one tile wide and crosses on one or two exit tiles, landing beside
+            # each of them, so checking every exit tile covers every way of crossing
+            blocked = np.count_nonzero(exits & ~landing)
+            if blocked:
+                warnings.append(((x, y), f'{blocked} border tiles to the {direction} put players inside stone '
+                                         f'in cell {x + dx},{y + dy}'))
+            both = exits & landing
+            pairs = zip(SIDES[direction](regions, 0)[both].tolist(),
+                        SIDES[OPPOSITE[direction]](neighbour[2], LANDING_DEPTH)[both].tolist())
+            for a, b in set(pairs):
+                edges.setdefault(((x, y), a), set()).add(((x + dx, y + dy), b))
+
+    if start_cell not in valid:
+        errors.append((start_cell, 'is the start cell but has no valid map'))
+        return errors, warnings
+    start_label = int(valid[start_cell][2][start_tile[1], start_tile[0]])
+    if start_label < 0:
+        errors.append((start_cell, f'has stone on the start tile {start_tile[0]},{start_tile[1]}'))
+        return errors, warnings
+    reached = reachable_regions(edges, (start_cell, start_label))
+
+    for key, (tiles, overlay, regions) in sorted(valid.items()):
+        labels = np.unique(regions[regions >= 0]).tolist()
+        if labels and not any((key, label) in reached for label in labels):
+            warnings.append((key, 'cannot be reached from the start'))
+        if overlay is None:
+            continue
+        ys, xs = np.nonzero(np.isin(overlay, SPAWN_KINDS))
+        for tile_x, tile_y, kind in zip(xs.tolist(), ys.tolist(), overlay[ys, xs].tolist()):
+            name = Tile(kind).name.lower()
+            label = int(regions[tile_y, tile_x])
+            if label < 0:
+                errors.append((key, f'{name} at tile {tile_x},{tile_y} is inside stone'))
+            elif (key, label) not in reached:
+                warnings.append((key, f'{name} at tile {tile_x},{tile_y} cannot be reached from the start'))
+    return errors, warnings
+
+# Decode the changed cells of a maps directory on a process pool, take the others from the
+# cache, check the world and write it unless there are errors, or warnings when strict
+def compile_world(directory, path, cache_path=CACHE_FILE, workers=None, start_cell=START_CELL, strict=False):
+    sources = scan_directory(directory)
+    hashes = {key: content_hash(paths) for key, paths in sources.items()}
+    cache = load_cache(cache_path) if cache_path else {}
+    cells = {key: cache[hashes[key]] for key in sources if hashes[key] in cache}
+    jobs = [(key, *sources[key]) for key in sources if key not in cells]
+    if jobs:
+        with Pool(workers) as pool:
+            cells.update(pool.imap_unordered(compile_cell, jobs, chunksize=max(len(jobs) // 64, 1)))
+
+    errors, warnings = check_world(cells, start_cell)
+    if cache_path:
+        save_cache(cache_path, {hashes[key]: cell for key, cell in cells.items()
+                                if cell[0] is not None and cell[0].shape == CELL_SHAPE
+                                and (cell[1] is None or cell[1].shape == CELL_SHAPE)})
+    written = not errors and not (strict and warnings)
+    if written:
+        write_world(path, {key: (tiles, [] if overlay is None else [overlay])
+                           for key, (tiles, overlay, _) in cells.items()}, CELL_SHAPE[1], CELL_SHAPE[0])
+    return {'cells': len(cells), 'compiled': len(jobs), 'errors': errors, 'warnings': warnings, 'written': written}
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the map cells and compile them into a packed world file')
+    parser.add_argument('directory', nargs='?', default='maps', help='directory with the map and monster PNGs')
+    parser.add_argument('output', nargs='?', default=WORLD_FILE, help='world file to write')
+    parser.add_argument('--cache', default=CACHE_FILE, help='compiled cell cache, empty to compile every cell')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--start', default=','.join(map(str, START_CELL)), help='start cell as x,y')
+    parser.add_argument('--strict', action='store_true', help='fail on warnings too, without writing the world')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    start_cell = tuple(int(part) for part in args.start.split(','))
+    result = compile_world(args.directory, args.output, args.cache, args.workers, start_cell, args.strict)
+    seconds = time.perf_counter() - start
+
+    for label, problems in (('error', result['errors']), ('warning', result['warnings'])):
+        for (x, y), message in sorted(problems):
+            print(f'{label}: cell {x},{y} {message}')
+    print(f'{result["cells"]} cells, {result["compiled"]} decoded and {result["cells"] - result["compiled"]} '
+          f'from the cache in {seconds:.2f} s: {len(result["errors"])} errors, {len(result["warnings"])} warnings')
+    if not result['written']:
+        print(f'{args.output} was not written')
+        sys.exit(1)
+    print(f'Wrote {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from tiles import MAP_SUFFIX, Tile, cell_files, decode_map, decode_overlay
+
+# Packed world file layout:
+#   header   magic, version, cell width, cell height, cell count
+#   index    cell keys (int64), tile plane offsets and overlay plane offsets (uint64),
+#            one column after the other, sorted by key; offset 0 means no plane
+#   planes   raw uint8 tile and overlay planes, width * height bytes each
+MAGIC = b'BYGW'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHI')
+WORLD_FILE = 'world.bygw'
+
+# Index key that sorts cells by x, then y
+def cell_key(x, y):
+    return (x << 32) + y
+
+# Write a world given as {(x, y): (tiles, overlays)}
+def write_world(path, cells, width=32, height=32):
+    plane_size = width * height
+    keys = sorted(cells, key=lambda xy: cell_key(*xy))
+    index_keys = np.array([cell_key(x, y) for x, y in keys], dtype='<i8')
+    tile_offsets = np.zeros(len(keys), dtype='<u8')
+    overlay_offsets = np.zeros(len(keys), dtype='<u8')
+    offset = HEADER.size + 24 * len(keys)
+    planes = []
+    for i, key in enumerate(keys):
+        tiles, overlays = cells[key]
+        if tiles is not None:
+            tile_offsets[i] = offset
+            planes.append(np.ascontiguousarray(tiles, dtype=np.uint8))
+            offset += plane_size
+        if overlays:
+            # Several overlays of one cell are merged into a single plane
+            overlay = np.zeros((height, width), dtype=np.uint8)
+            for layer in overlays:
+                overlay = np.where(layer != Tile.EMPTY, layer, overlay)
+            overlay_offsets[i] = offset
+            planes.append(overlay.astype(np.uint8))
+            offset += plane_size
+
+    # Write to a temporary file first so readers never see a partial world
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, width, height, len(keys)))
+        for column in (index_keys, tile_offsets, overlay_offsets):
+            file.write(column.tobytes())
+        for plane in planes:
+            file.write(plane.tobytes())
+    os.replace(temp_path, path)
+
+# Read the PNG maps directory into {(x, y): (tiles, overlays)}
+def read_png_directory(directory):
+    cells = {}
+    for key, suffix, path in cell_files(directory):
+        tiles, overlays = cells.get(key, (None, []))
+        if suffix == MAP_SUFFIX:
+            tiles = decode_map(path)
+        else:
+            overlays = overlays + [decode_overlay(path)]
+        cells[key] = (tiles, overlays)
+    return cells
+
+def convert_directory(directory, path):
+    cells = read_png_directory(directory)
+    shapes = {tiles.shape for tiles, _ in cells.values() if tiles is not None}
+    height, width = shapes.pop() if len(shapes) == 1 else (32, 32)
+    write_world(path, cells, width, height)
+    return len(cells)
+
+# Memory-mapped world file handing out zero-copy, read-only views of its cells
+class WorldFile:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.height, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} world file')
+        self.keys_index = np.frombuffer(self.data, dtype='<i8', count=count, offset=HEADER.size)
+        self.tile_offsets = np.frombuffer(self.data, dtype='<u8', count=count, offset=HEADER.size + 8 * count)
+        self.overlay_offsets = np.frombuffer(self.data, dtype='<u8', count=count, offset=HEADER.size + 16 * count)
+
+    def __len__(self):
+        return len(self.keys_index)
+
+    def keys(self):
+        return [(int(key) >> 32, int(key) & 0xFFFFFFFF) for key in self.keys_index]
+
+    def plane(self, offset):
+        return np.frombuffer(self.data, dtype=np.uint8, count=self.width * self.height,
+                             offset=int(offset)).reshape(self.height, self.width)
+
+    # Binary search in the sorted index, so lookups do not depend on world size
+    def cell(self, x, y):
+        key = cell_key(x, y)
+        i = np.searchsorted(self.keys_index, key)
+        if i == len(self.keys_index) or self.keys_index[i] != key:
+            return None, []
+        tiles = self.plane(self.tile_offsets[i]) if self.tile_offsets[i] else None
+        overlays = [self.plane(self.overlay_offsets[i])] if self.overlay_offsets[i] else []
+        return tiles, overlays
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'maps'
+    path = sys.argv[2] if len(sys.argv) > 2 else WORLD_FILE
+    count = convert_directory(directory, path)
+    print(f'Wrote {count} cells from {directory} to {path}')